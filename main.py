@@ -1,15 +1,32 @@
-import streamlit as st
-import plotly.graph_objects as go
 import time
+_import_started = time.perf_counter()
+
+import hmac
+import logging
+import math
+import os
+import streamlit as st
 from datetime import datetime, timedelta
-import pandas as pd
 
-from utils.database import Database
-from utils.sensors import SensorSimulator
+# plotly, pandas and psycopg2 are imported lazily via utils.startup so the
+# first paint does not wait for them
+from utils import startup
+from utils.database import Database, bucket_means
+from utils.async_storage import AsyncStorage
+from utils.calibration import CalibrationCurve, parse_points
+from utils.sensors import SENSOR_TYPES, SensorSimulator
 from utils.alerts import AlertSystem
 from utils.recommendations import WaterQualityRecommender
+from utils.rules import DEFAULT_RULES, load_rules
+from utils.sampling import DEFAULT_POLICIES, SamplingLoop, SamplingScheduler, load_policies
 from utils.maintenance import MaintenanceScheduler
 from utils.remote_access import remote_access
+from utils.live_feed import LiveFeed, start_live_server
+from utils.profiling import RerunProfiler
+
+startup.record('import app modules', _import_started)
+
+logger = logging.getLogger(__name__)
 
 # Page configuration
 st.set_page_config(
@@ -22,25 +39,125 @@ st.set_page_config(
 # Initialize components
 @st.cache_resource
 def init_components():
-    return (
-        Database(), 
-        SensorSimulator(), 
-        AlertSystem(), 
-        WaterQualityRecommender(),
-        MaintenanceScheduler()
-    )
+    with startup.measure('init components'):
+        components = (
+            Database(), 
+            SensorSimulator(load_rules(os.environ['HUBSOAK_RULES'])
+                            if os.environ.get('HUBSOAK_RULES') else DEFAULT_RULES),
+            AlertSystem(), 
+            WaterQualityRecommender(),
+            MaintenanceScheduler()
+        )
+    # Connect and check schemas in the background while the page draws
+    components[0].warm_up()
+    components[4].warm_up()
+    return components
+
+@st.cache_resource
+def init_sensor_poller():
+    """Poll hardware probes when HUBSOAK_PROBES names a probe config file."""
+    config_path = os.environ.get('HUBSOAK_PROBES')
+    if not config_path:
+        return None
+    from utils.poller import load_poller
+    # A probe counts as stale only once it has missed its own sampling interval
+    intervals = {sensor: policy['interval'] for sensor, policy in init_sampler().policies.items()}
+    return load_poller(config_path, intervals)
+
+@st.cache_resource
+def init_sampler():
+    """Per-sensor cadence and deadband, overridable with a HUBSOAK_SAMPLING file."""
+    config_path = os.environ.get('HUBSOAK_SAMPLING')
+    return SamplingScheduler(load_policies(config_path) if config_path else DEFAULT_POLICIES)
+
+@st.cache_resource
+def init_sampling():
+    """Samples on its own background thread, so cadence does not depend on page reruns."""
+    _, sensor_simulator, _, _, _ = init_components()
+    poller = init_sensor_poller()
+
+    def read(due):
+        if poller:
+            return poller.get_raw_readings(due)
+        return {sensor: value for sensor, value in sensor_simulator.get_raw_readings().items()
+                if sensor in due}
+
+    # Raw values that moved past their deadband are logged; calibration is
+    # applied when history is read
+    return SamplingLoop(init_sampler(), read, init_storage().log_values).start()
+
+@st.cache_resource
+def init_live_feed():
+    """One shared feed, fed by one background producer, serves every read-only remote viewer."""
+    db, sensor_simulator, _, _, _ = init_components()
+    sampler = init_sampler()
+    # Duration rules in the feed track their own breaches, apart from the page's
+    rule_state = sensor_simulator.rule_engine.new_state()
+
+    def latest_reading():
+        if not sampler.latest:
+            return None
+        sensor_simulator.refresh_calibration(db)
+        readings = sensor_simulator.calibrate({sensor: sampler.latest.get(sensor) for sensor in SENSOR_TYPES})
+        alerts = [
+            {'sensor': name, 'message': message, 'severity': severity}
+            for name, (is_alert, message, severity)
+            in sensor_simulator.rule_engine.evaluate(readings, state=rule_state).items() if is_alert
+        ]
+        return readings, alerts
+
+    feed = LiveFeed()
+    feed.run_producer(latest_reading, seed=lambda: db.get_historical_data(hours=12))
+    try:
+        start_live_server(feed, remote_access.live_port)
+    except OSError as e:
+        logger.warning("Live feed server not started on port %s: %s", remote_access.live_port, e)
+    return feed
+
+@st.cache_resource
+def init_profiler():
+    """Shared by all sessions so an operator can profile a kiosk's reruns."""
+    return RerunProfiler(os.environ.get('HUBSOAK_PROFILE_DIR', 'profiles'))
+
+@st.cache_resource
+def init_storage():
+    """Concurrent reads and queued writes over the pooled database connections."""
+    db, _, _, _, maintenance = init_components()
+    return AsyncStorage(db, maintenance, profiler=init_profiler())
 
 db, sensor_simulator, alert_system, recommender, maintenance = init_components()
+storage = init_storage()
+sensor_poller = init_sensor_poller()
+sampler = init_sampler()
+sampling = init_sampling()
+live_feed = init_live_feed()
+rerun_profiler = init_profiler()
+
+def is_operator():
+    """Operator tools are shown only with ?operator=<HUBSOAK_OPERATOR_KEY> in the URL."""
+    key = os.environ.get('HUBSOAK_OPERATOR_KEY')
+    # Compared as bytes: compare_digest rejects non-ASCII str
+    return bool(key) and hmac.compare_digest(st.query_params.get('operator', '').encode(), key.encode())
+
+def reading_metric(label, value, target, decimals=1, unit='', delta_unit=''):
+    """st.metric for a reading; a sensor with no reading yet shows a dash."""
+    if value is None or math.isnan(value):
+        st.metric(label, "—", "no reading", delta_color="off")
+        return
+    st.metric(label, f"{value:.{decimals}f}{unit}", f"{value - target:.{decimals}f}{delta_unit}")
 
 def create_sensor_plot(df, sensor_name, color, y_min, y_max, unit):
     """Create a touch-optimized plot for a single sensor"""
+    go = startup.lazy_import('plotly.graph_objects')
     fig = go.Figure()
     
     fig.add_trace(go.Scatter(
         x=df['timestamp'],
         y=df[sensor_name],
         name=sensor_name.replace('_', ' ').title(),
-        line=dict(color=color, width=4),  # Thicker lines for better visibility
+        # Thicker lines for better visibility; step-wise since values are
+        # held until the next stored change
+        line=dict(color=color, width=4, shape='hv'),
         mode='lines+markers',  # Add markers for better touch targets
         marker=dict(size=10)  # Larger markers for touch
     ))
@@ -69,14 +186,15 @@ def create_sensor_plot(df, sensor_name, color, y_min, y_max, unit):
     
     return fig
 
-def render_maintenance_section():
+def render_maintenance_section(tasks, task_history):
+    """Render maintenance from prefetched tasks due within a year and their history."""
     st.header("🔧 Maintenance")
     
     # Tabs for different maintenance views
     tab1, tab2, tab3 = st.tabs(["📅 Tasks", "➕ New", "📖 History"])
     
     with tab1:
-        upcoming_tasks = maintenance.get_upcoming_tasks(days_ahead=14)
+        upcoming_tasks = [task for task in tasks if task['next_due'] <= datetime.now() + timedelta(days=14)]
         if not upcoming_tasks:
             st.info("No upcoming tasks in next 14 days")
         else:
@@ -112,7 +230,6 @@ def render_maintenance_section():
                     st.error("Fill all fields")
     
     with tab3:
-        tasks = maintenance.get_upcoming_tasks(days_ahead=365)
         if tasks:
             task_id = st.selectbox(
                 "Select Task",
@@ -120,7 +237,7 @@ def render_maintenance_section():
                 format_func=lambda x: next(task['task_name'] for task in tasks if task['id'] == x)
             )
             
-            history = maintenance.get_task_history(task_id)
+            history = task_history.get(task_id, [])
             if history:
                 for entry in history:
                     st.write(f"✓ {entry['completed_at'].strftime('%Y-%m-%d')}")
@@ -139,6 +256,8 @@ def render_remote_access_section():
     with st.expander("📡 Connection Info", expanded=True):
         st.write("**Access URL:**")
         st.code(connection_info['url'])
+        st.write("**Live Viewer URL:**")
+        st.code(connection_info['live_url'])
         st.write("**Security:**")
         st.info("• HTTPS encrypted\n• Read-only access\n• Activity logged")
     
@@ -154,8 +273,37 @@ def render_remote_access_section():
     st.checkbox("📧 Email Alerts", help="Get email when accessed")
     st.slider("🔄 Refresh (sec)", 5, 60, 10)
 
-def main():
+def render_profiling_section():
+    with st.expander("🔬 Profiling"):
+        mode = st.radio("Mode", ['sampling', 'deterministic'], horizontal=True,
+                        help="Sampling has little overhead; deterministic traces every call")
+        reruns = st.number_input("Reruns", 1, 50, 5)
+        if st.button("Capture", use_container_width=True):
+            try:
+                rerun_profiler.arm(int(reruns), mode)
+            except ValueError as e:
+                st.error(str(e))
+        if rerun_profiler.remaining:
+            st.info(f"Capturing, {rerun_profiler.remaining} reruns to go")
+
+        report = rerun_profiler.last_report
+        if report:
+            st.caption(f"{report['reruns']} reruns, {report['wall_ms']:.0f} ms ({report['mode']})")
+            for category, elapsed_ms in report['categories'].items():
+                st.text(f"{category}: {elapsed_ms:.0f} ms")
+            st.table([
+                {'Function': spot['function'], 'Category': spot['category'],
+                 'Self (ms)': round(spot['self_ms'], 1), 'Total (ms)': round(spot['total_ms'], 1)}
+                for spot in report['hot_spots']
+            ])
+            with open(report['path'], 'rb') as f:
+                st.download_button("Download", f.read(), file_name=os.path.basename(report['path']),
+                                   use_container_width=True)
+
+def render_dashboard():
+    """Render one pass of the dashboard and return the refresh interval."""
     st.title("🌊 Hot Tub Monitor")
+    startup.record('first paint', _import_started)
     
     # Sidebar with larger touch targets
     with st.sidebar:
@@ -165,11 +313,7 @@ def main():
         show_historical = st.checkbox("📈 Show History", True)
         
         st.header("🎯 Calibration")
-        sensor_type = st.selectbox(
-            "Sensor", 
-            ["ph", "temperature", "turbidity", "orp", "conductivity", 
-             "free_chlorine", "total_chlorine", "bromine", "uv_intensity"]
-        )
+        sensor_type = st.selectbox("Sensor", SENSOR_TYPES)
         offset = st.number_input(f"Offset", -10.0, 10.0, 0.0, 0.1)
         scale = st.number_input(f"Scale", 0.1, 2.0, 1.0, 0.1)
         
@@ -178,6 +322,42 @@ def main():
             db.update_calibration(sensor_type, offset, scale)
             st.success("Updated!")
 
+        with st.expander("📐 Multi-point"):
+            points_text = st.text_area("Points (raw = actual, one per line)",
+                                       placeholder="4.01 = 4.00\n6.86 = 7.00\n9.18 = 10.01")
+            valid_from = st.date_input("Apply from", datetime.now().date(),
+                                       help="Today applies from now; pick a past date to recalibrate "
+                                            "stored history from its midnight")
+            if st.button("Apply Curve", use_container_width=True):
+                try:
+                    curve = CalibrationCurve(parse_points(points_text))
+                    # Today means now, so readings already stored today keep their calibration
+                    now = datetime.now()
+                    db.set_calibration(sensor_type, curve,
+                                       now if valid_from == now.date()
+                                       else datetime.combine(valid_from, datetime.min.time()))
+                    # Reloaded from storage, so a future-dated curve waits for its date
+                    sensor_simulator.calibration_loaded = False
+                    st.success("Updated!")
+                except ValueError as e:
+                    st.error(str(e))
+
+        with st.expander("⏲️ Sampling"):
+            for sensor, policy in sampler.policies.items():
+                st.text(f"{sensor}: every {policy['interval']}s, ±{policy['epsilon']}, "
+                        f"max age {policy['max_age']}s")
+
+        with st.expander("⏱️ Startup"):
+            for name, elapsed_ms in startup.get_timings().items():
+                st.text(f"{name}: {elapsed_ms:.0f} ms")
+
+        if is_operator():
+            render_profiling_section()
+
+    # Start this rerun's reads now, concurrently, while the readings are drawn
+    dashboard = storage.submit(storage.fetch_dashboard(
+        history_hours=12 if show_historical else None))
+
     # Main content area
     tab1, tab2, tab3 = st.tabs(["📊 Monitor", "🔧 Maintain", "🔒 Remote"])
     
@@ -186,64 +366,33 @@ def main():
             # Add update timestamp indicator
             last_update = st.empty()
             
-            # Get and display readings
-            readings = sensor_simulator.get_readings()
+            sensor_simulator.refresh_calibration(db)
+
+            # The sampling thread keeps the latest value of each sensor
+            raw_readings = {sensor: sampler.latest.get(sensor) for sensor in SENSOR_TYPES}
+            readings = sensor_simulator.calibrate(raw_readings)
             alerts = sensor_simulator.check_alerts(readings)
             
             # Update timestamp
             last_update.info(f"🔄 Last Update: {datetime.now().strftime('%H:%M:%S')}")
+            if sensor_poller and sensor_poller.stale_sensors():
+                st.warning(f"⏳ Stale: {', '.join(sensor_poller.stale_sensors())}")
             
             # Display readings in 2x5 grid for better touch interaction
             col1, col2 = st.columns(2)
             
             with col1:
-                st.metric(
-                    "pH Level",
-                    f"{readings['ph']:.1f}",
-                    f"{readings['ph'] - 7.0:.1f}"
-                )
-                st.metric(
-                    "Temperature",
-                    f"{readings['temperature']:.1f}°C",
-                    f"{readings['temperature'] - 37.5:.1f}°C"
-                )
-                st.metric(
-                    "Turbidity",
-                    f"{readings['turbidity']:.1f} NTU",
-                    f"{readings['turbidity'] - 2.0:.1f}"
-                )
-                st.metric(
-                    "ORP Level",
-                    f"{readings['orp']:.0f} mV",
-                    f"{readings['orp'] - 700.0:.0f}"
-                )
-                st.metric(
-                    "UV Intensity",
-                    f"{readings['uv_intensity']:.1f} mW/cm²",
-                    f"{readings['uv_intensity'] - 25.0:.1f}"
-                )
+                reading_metric("pH Level", readings['ph'], 7.0)
+                reading_metric("Temperature", readings['temperature'], 37.5, unit='°C', delta_unit='°C')
+                reading_metric("Turbidity", readings['turbidity'], 2.0, unit=' NTU')
+                reading_metric("ORP Level", readings['orp'], 700.0, decimals=0, unit=' mV')
+                reading_metric("UV Intensity", readings['uv_intensity'], 25.0, unit=' mW/cm²')
             
             with col2:
-                st.metric(
-                    "TDS",
-                    f"{readings['conductivity']:.0f} ppm",
-                    f"{readings['conductivity'] - 600.0:.0f}"
-                )
-                st.metric(
-                    "Bromine",
-                    f"{readings['bromine']:.1f} ppm",
-                    f"{readings['bromine'] - 4.0:.1f}"
-                )
-                st.metric(
-                    "Free Chlorine",
-                    f"{readings['free_chlorine']:.1f} ppm",
-                    f"{readings['free_chlorine'] - 2.0:.1f}"
-                )
-                st.metric(
-                    "Total Chlorine",
-                    f"{readings['total_chlorine']:.1f} ppm",
-                    f"{readings['total_chlorine'] - 3.0:.1f}"
-                )
+                reading_metric("TDS", readings['conductivity'], 600.0, decimals=0, unit=' ppm')
+                reading_metric("Bromine", readings['bromine'], 4.0, unit=' ppm')
+                reading_metric("Free Chlorine", readings['free_chlorine'], 2.0, unit=' ppm')
+                reading_metric("Total Chlorine", readings['total_chlorine'], 3.0, unit=' ppm')
 
             # Process and display alerts
             current_alerts = alert_system.process_alerts(alerts)
@@ -261,23 +410,17 @@ def main():
                         st.write(f"**Action:** {rec['action']}")
                         st.info(f"**Details:** {rec['details']}")
 
-            # Log readings
-            db.log_reading(
-                readings['ph'], readings['temperature'], readings['turbidity'],
-                readings['orp'], readings['conductivity'], readings['free_chlorine'],
-                readings['total_chlorine'], readings['bromine'], readings['uv_intensity']
-            )
-
             # Historical visualization with individual plots
             if show_historical:
                 st.header("📈 Sensor History (12-Hour)")
-                historical_data = db.get_historical_data(hours=12)
+                historical_data = dashboard.result()['history']
                 
-                if historical_data:
-                    df = pd.DataFrame(historical_data)
-                    df.columns = ['timestamp', 'ph_level', 'temperature', 'turbidity', 
-                                'orp_level', 'conductivity', 'free_chlorine', 
-                                'total_chlorine', 'bromine', 'uv_intensity']
+                if isinstance(historical_data, Exception):
+                    st.error(f"Error loading history: {str(historical_data)}")
+                elif len(historical_data['timestamp']):
+                    pd = startup.lazy_import('pandas')
+                    # One-minute means keep 12 hours at 720 points per chart
+                    df = pd.DataFrame(bucket_means(historical_data, 60))
                     
                     # Sensor configurations with proper ranges and units
                     sensor_configs = [
@@ -312,22 +455,37 @@ def main():
                             avg_value = df[sensor].mean()
                             col1, col2 = st.columns(2)
                             with col1:
-                                st.info(f"Current: {current_value:.1f} {unit}")
+                                st.info(f"Current: {current_value:.1f} {unit}" if not math.isnan(current_value)
+                                        else "Current: no reading")
                             with col2:
                                 st.info(f"Average: {avg_value:.1f} {unit}")
                     
-            # Add automatic refresh based on update_interval
-            time.sleep(update_interval)
-            st.rerun()
-                    
         except Exception as e:
             st.error(f"Error: {str(e)}")
     
     with tab2:
-        render_maintenance_section()
+        # A failed read is shown here rather than raised, so the refresh keeps running
+        try:
+            data = dashboard.result()
+            for result in (data['upcoming_tasks'], data['task_history']):
+                if isinstance(result, Exception):
+                    raise result
+            render_maintenance_section(data['upcoming_tasks'], data['task_history'])
+        except Exception as e:
+            st.error(f"Error loading maintenance: {str(e)}")
         
     with tab3:
         render_remote_access_section()
 
+    return update_interval
+
+def main():
+    with rerun_profiler.capture():
+        update_interval = render_dashboard()
+
+    # Add automatic refresh based on update_interval
+    time.sleep(update_interval)
+    st.rerun()
+
 if __name__ == "__main__":
     main()
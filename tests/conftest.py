@@ -0,0 +1,85 @@
+import os
+import pty
+import random
+import threading
+import time
+import tty
+
+import pytest
+
+
+class FakeSerialDevice:
+    """Pseudo-terminal that answers SerialProbe commands like a real probe.
+
+    Point a SerialProbe at .port to exercise the serial path, latency and
+    timeouts without hardware attached.
+    """
+
+    def __init__(self, low: float, high: float, latency: float = 0.1, silent: bool = False):
+        self.low = low
+        self.high = high
+        self.latency = latency
+        # A silent device never answers, to exercise timeouts
+        self.silent = silent
+        self._master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self._running = True
+        threading.Thread(target=self._serve, name=f'fake-{self.port}', daemon=True).start()
+
+    def _serve(self):
+        buffer = b''
+        while self._running:
+            try:
+                chunk = os.read(self._master, 256)
+            except OSError:
+                return
+            buffer += chunk
+            while b'\r' in buffer:
+                command, _, buffer = buffer.partition(b'\r')
+                if self.silent:
+                    continue
+                time.sleep(self.latency)
+                if command.strip() == b'R':
+                    reply = f"{random.uniform(self.low, self.high):.3f}\r*OK\r"
+                else:
+                    reply = "*ER\r"
+                try:
+                    os.write(self._master, reply.encode('ascii'))
+                except OSError:
+                    # Closed while answering
+                    return
+
+    def close(self):
+        self._running = False
+        os.close(self._master)
+        os.close(self._slave)
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    """Run in a zone with daylight saving time, away from UTC."""
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def devices():
+    """Make FakeSerialDevices, closed at the end of the test."""
+    opened = []
+
+    def make(**kwargs):
+        device = FakeSerialDevice(**dict({'low': 7.0, 'high': 7.5}, **kwargs))
+        opened.append(device)
+        return device
+
+    yield make
+    for device in opened:
+        try:
+            device.close()
+        except OSError:
+            pass
@@ -0,0 +1,133 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils.calibration import CalibrationCurve, CalibrationHistory, parse_points
+from utils.database import READING_COLUMNS, calibrate_rows
+from utils.sensors import SensorSimulator
+
+START = datetime(2024, 5, 1, 12, 0)
+
+
+def version(number, sensor, valid_from, points):
+    return {'version': number, 'sensor_type': sensor, 'valid_from': valid_from,
+            'curve': CalibrationCurve(points)}
+
+
+def test_no_points_is_identity_and_one_point_an_offset():
+    assert CalibrationCurve().apply(7.3) == 7.3
+    assert np.allclose(CalibrationCurve([(7.0, 7.2)]).apply([6.0, 8.0]), [6.2, 8.2])
+
+
+def test_curve_interpolates_and_extends_end_segments():
+    curve = CalibrationCurve([(9.18, 10.01), (4.01, 4.00), (6.86, 7.00)])
+
+    # Points are sorted by raw value
+    assert curve.points[0] == (4.01, 4.00)
+    assert np.allclose(curve.apply([4.01, 6.86, 9.18]), [4.00, 7.00, 10.01])
+    midway = curve.apply((4.01 + 6.86) / 2)
+    assert midway == pytest.approx(5.5)
+    # Below and above the range, the first and last segments are extended
+    low_slope = (7.00 - 4.00) / (6.86 - 4.01)
+    high_slope = (10.01 - 7.00) / (9.18 - 6.86)
+    assert curve.apply(3.01) == pytest.approx(4.00 - low_slope)
+    assert curve.apply(10.18) == pytest.approx(10.01 + high_slope)
+
+
+def test_from_offset_scale_matches_legacy_formula():
+    curve = CalibrationCurve.from_offset_scale(0.5, 1.1)
+
+    raw = np.array([-3.0, 0.0, 7.2, 800.0])
+    assert np.allclose(curve.apply(raw), (raw + 0.5) * 1.1)
+    assert CalibrationCurve.from_json(curve.to_json()).points == curve.points
+
+
+def test_duplicate_raw_values_are_rejected():
+    with pytest.raises(ValueError):
+        CalibrationCurve([(7.0, 7.1), (7.0, 7.2)])
+
+
+def test_history_applies_version_in_effect_at_each_timestamp():
+    history = CalibrationHistory([
+        version(1, 'ph', START, [(7.0, 7.1)]),
+        version(2, 'ph', START + timedelta(hours=2), [(7.0, 7.3)]),
+        # Backdated: takes over from its valid_from although recorded later
+        version(3, 'ph', START + timedelta(hours=1), [(7.0, 7.2)]),
+    ])
+    timestamps = np.array([START - timedelta(minutes=1), START, START + timedelta(minutes=90),
+                           START + timedelta(hours=3)], dtype='datetime64[us]')
+
+    calibrated = history.apply('ph', timestamps, np.full(4, 7.0))
+
+    assert np.allclose(calibrated, [7.0, 7.1, 7.2, 7.2])
+    # Sensors without versions are left raw
+    assert np.allclose(history.apply('orp', timestamps, np.full(4, 700.0)), 700.0)
+
+
+def test_current_ignores_future_versions_and_next_change_finds_them():
+    history = CalibrationHistory([
+        version(1, 'ph', START, [(7.0, 7.1)]),
+        version(2, 'ph', START + timedelta(days=1), [(7.0, 7.3)]),
+        version(3, 'orp', START + timedelta(hours=6), [(700.0, 710.0)]),
+    ])
+
+    current = history.current(START + timedelta(hours=1))
+    assert list(current) == ['ph']
+    assert current['ph'].apply(7.0) == pytest.approx(7.1)
+    assert history.next_change(START + timedelta(hours=1)) == START + timedelta(hours=6)
+
+    later = START + timedelta(days=2)
+    assert history.current(later)['ph'].apply(7.0) == pytest.approx(7.3)
+    assert history.next_change(later) is None
+
+
+def test_parse_points():
+    assert parse_points("4.01 = 4.00\n\n 6.86=7 \n") == [(4.01, 4.0), (6.86, 7.0)]
+
+
+@pytest.mark.parametrize('text', ["", "  \n", "7.0", "7.0 = abc", "nan = 7.0", "7.0 = inf"])
+def test_parse_points_rejects_invalid_input(text):
+    with pytest.raises(ValueError):
+        parse_points(text)
+
+
+def test_calibrate_rows_recalibrates_from_backdated_version():
+    rows = [(START + timedelta(hours=h), *(7.0 if column == 'ph_level' else None for column in READING_COLUMNS))
+            for h in range(4)]
+    history = CalibrationHistory([
+        version(1, 'ph', START, [(7.0, 7.1)]),
+        version(2, 'ph', START + timedelta(hours=2), [(7.0, 6.9)]),
+    ])
+
+    columns = calibrate_rows(rows, history)
+
+    assert np.allclose(columns['ph_level'], [7.1, 7.1, 6.9, 6.9])
+    assert columns['timestamp'].dtype == np.dtype('datetime64[us]')
+
+
+def test_refresh_calibration_reloads_only_when_stale():
+    versions = [
+        version(1, 'ph', datetime.now() - timedelta(days=1), [(7.0, 7.1)]),
+        version(2, 'ph', datetime.now() + timedelta(seconds=0.2), [(7.0, 7.3)]),
+    ]
+
+    class Store:
+        loads = 0
+
+        def get_calibration_history(self):
+            self.loads += 1
+            return CalibrationHistory(versions)
+
+    store, simulator = Store(), SensorSimulator()
+    simulator.refresh_calibration(store)
+    simulator.refresh_calibration(store)
+    assert store.loads == 1
+    assert simulator.calibrate({'ph': 7.0})['ph'] == pytest.approx(7.1)
+
+    # The future-dated version takes effect and triggers a reload
+    time.sleep(0.3)
+    simulator.refresh_calibration(store)
+    assert store.loads == 2
+    assert simulator.calibrate({'ph': 7.0})['ph'] == pytest.approx(7.3)
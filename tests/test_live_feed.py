@@ -0,0 +1,64 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils.database import READING_COLUMNS
+from utils.live_feed import LiveFeed
+
+
+def history(*ages_minutes, value=7.2):
+    now = datetime.now()
+    columns = {'timestamp': np.array([now - timedelta(minutes=age) for age in ages_minutes],
+                                     dtype='datetime64[us]')}
+    for column in READING_COLUMNS:
+        columns[column] = np.full(len(ages_minutes), value)
+    return columns
+
+
+def test_seeded_history_lines_up_with_live_buckets(new_york):
+    feed = LiveFeed(bucket_seconds=60)
+    feed.seed_history(history(5))
+    feed.publish({'ph': 7.4}, [])
+
+    starts = [point['t'] for point in feed.snapshot()['history']]
+    assert len(starts) == 2
+    assert 4 * 60 <= starts[1] - starts[0] <= 6 * 60
+
+
+def test_history_is_seeded_once_under_concurrent_callers():
+    feed = LiveFeed()
+    columns = history(30, 20, 10)
+    threads = [threading.Thread(target=feed.seed_history, args=(columns,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert feed.seeded
+    counts = [bucket['counts']['ph'] for bucket in feed._buckets.values()]
+    assert counts == [1, 1, 1]
+
+
+def test_seeding_after_publishing_skips_readings_already_published():
+    feed = LiveFeed()
+    feed.publish({'ph': 7.4}, [])
+    # The database also holds the published reading, logged a moment later
+    feed.seed_history(history(10, -0.01, value=7.4))
+
+    assert sum(bucket['counts']['ph'] for bucket in feed._buckets.values()) == 2
+
+
+def test_producer_publishes_without_any_page_open():
+    feed = LiveFeed()
+    values = iter(range(100))
+    feed.run_producer(lambda: ({'ph': 7.0 + next(values) / 100}, []), interval=0.05,
+                      seed=lambda: history(30))
+    time.sleep(0.3)
+
+    snapshot = feed.snapshot()
+    assert feed.seeded
+    assert snapshot['reading']['ph'] > 7.0
+    assert len(snapshot['history']) >= 1
@@ -0,0 +1,151 @@
+import json
+import os
+import tempfile
+import time
+
+import pytest
+
+from utils.drivers import SensorDriver, SerialProbe, SimulatedProbe
+from utils.poller import AsyncSensorPoller, load_poller
+
+
+@pytest.fixture
+def pollers():
+    started = []
+
+    def make(drivers, **kwargs):
+        poller = AsyncSensorPoller(drivers, **kwargs)
+        started.append(poller)
+        return poller
+
+    yield make
+    for poller in started:
+        poller.close()
+
+
+def timed_poll(poller):
+    started = time.perf_counter()
+    readings = poller.poll()
+    return readings, time.perf_counter() - started
+
+
+def test_sensor_driver_is_abstract():
+    with pytest.raises(TypeError):
+        SensorDriver('ph')
+
+
+def test_serial_probes_are_polled_concurrently(devices, pollers):
+    latency = 0.2
+    sensors = ['ph', 'orp', 'temperature', 'bromine']
+    poller = pollers([SerialProbe(sensor, devices(latency=latency).port) for sensor in sensors],
+                     timeout=1.0, retries=0)
+
+    readings, elapsed = timed_poll(poller)
+
+    assert all(not readings[sensor]['stale'] for sensor in sensors)
+    assert all(7.0 <= readings[sensor]['value'] <= 7.5 for sensor in sensors)
+    # Close to the slowest probe, well short of the sum of all four
+    assert latency <= elapsed < latency * 2
+
+
+def test_simulated_probes_are_polled_concurrently(pollers):
+    drivers = [SimulatedProbe(f'probe{i}', 1.0, 2.0, latency=0.1) for i in range(9)]
+    poller = pollers(drivers, timeout=1.0, retries=0)
+
+    readings, elapsed = timed_poll(poller)
+
+    assert all(not reading['stale'] for reading in readings.values())
+    # Each read takes up to 1.5x latency; nine in a row would take ~0.9 s
+    assert elapsed < 0.3
+
+
+def test_silent_probe_times_out_retries_and_keeps_last_value(devices, pollers):
+    device = devices(latency=0.01)
+    poller = pollers([SerialProbe('ph', device.port)], timeout=0.2, retries=1)
+    good = poller.poll()['ph']
+    assert not good['stale']
+
+    device.silent = True
+    readings, elapsed = timed_poll(poller)
+
+    # One attempt plus one retry, each running into the timeout
+    assert elapsed >= 0.4
+    assert readings['ph']['stale']
+    assert readings['ph']['value'] == good['value']
+    assert readings['ph']['timestamp'] == good['timestamp']
+    assert 'no reply' in readings['ph']['error']
+    assert poller.stale_sensors() == ['ph']
+    assert poller.get_raw_readings() == {}
+
+
+def test_error_reply_marks_probe_stale(devices, pollers):
+    device = devices(latency=0.01)
+    poller = pollers([SerialProbe('ph', device.port, command='X')], timeout=0.5, retries=1)
+
+    reading = poller.poll()['ph']
+
+    assert reading['stale']
+    assert reading['value'] is None
+    assert 'rejected' in reading['error']
+
+
+def test_probe_reopens_after_device_is_unplugged(devices, pollers):
+    link = os.path.join(tempfile.mkdtemp(), 'ttyPH')
+    first = devices(latency=0.01)
+    os.symlink(first.port, link)
+    probe = SerialProbe('ph', link)
+    poller = pollers([probe], timeout=0.3, retries=0)
+    assert not poller.poll()['ph']['stale']
+
+    # Unplugged: reads fail with OSError and the port is closed
+    first.close()
+    reading = poller.poll()['ph']
+    assert reading['stale']
+    assert probe._fd is None
+
+    # Plugged back in (as a new device at the same path): the probe reopens it
+    second = devices(latency=0.01)
+    os.remove(link)
+    os.symlink(second.port, link)
+    reading = poller.poll()['ph']
+    assert not reading['stale']
+    assert 7.0 <= reading['value'] <= 7.5
+
+
+def test_staleness_allows_for_sampling_interval(pollers):
+    poller = pollers([SimulatedProbe('temperature', 20.0, 30.0, latency=0.0),
+                      SimulatedProbe('orp', 600.0, 700.0, latency=0.0)],
+                     stale_after=0.1, intervals={'temperature': 30.0})
+    poller.poll()
+
+    # Only orp is due; temperature is not sampled again for 30 s
+    time.sleep(0.2)
+    readings = poller.poll(['orp'])
+
+    assert not readings['temperature']['stale']
+    assert not readings['orp']['stale']
+    assert poller.stale_sensors() == []
+
+    # A sensor without a configured interval still goes stale after stale_after
+    time.sleep(0.2)
+    assert poller.poll(['temperature'])['orp']['stale']
+
+
+def test_per_probe_timeout_from_config(devices, tmp_path):
+    # Both answer after 0.4 s
+    ph_device, orp_device = devices(latency=0.4), devices(latency=0.4)
+    config = tmp_path / 'probes.json'
+    config.write_text(json.dumps({
+        'timeout': 0.2, 'retries': 0,
+        'probes': {'ph': {'port': ph_device.port, 'timeout': 1.0}, 'orp': {'port': orp_device.port}},
+    }))
+    poller = load_poller(str(config))
+    try:
+        readings = poller.poll(['ph', 'orp'])
+    finally:
+        poller.close()
+
+    # Only the probe with its own, longer timeout gets to answer
+    assert not readings['ph']['stale']
+    assert readings['orp']['stale']
+    assert readings['orp']['error'] == "no reply within 0.20s"
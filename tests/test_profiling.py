@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.profiling import RerunProfiler
+
+# A stand-in query, compiled as if it lived in utils/database.py
+_namespace = {}
+exec(compile("import time\n\ndef query():\n    time.sleep(0.2)\n    return 42\n",
+             '/app/utils/database.py', 'exec'), _namespace)
+query = _namespace['query']
+
+
+@pytest.mark.parametrize('mode', ['sampling', 'deterministic'])
+def test_queries_on_helper_threads_count_as_database(tmp_path, mode):
+    profiler = RerunProfiler(str(tmp_path), interval=0.002)
+    profiler.arm(1, mode)
+
+    with ThreadPoolExecutor(2) as executor, profiler.capture():
+        # As AsyncStorage runs queries while the rerun waits for them
+        assert executor.submit(profiler.run_helper, query).result() == 42
+
+    report = profiler.last_report
+    assert report['reruns'] == 1
+    assert report['categories']['database'] >= 0.1 * 1000
+    assert report['categories']['database'] > report['categories'].get('app', 0)
+
+
+def test_run_helper_outside_a_capture_just_calls(tmp_path):
+    profiler = RerunProfiler(str(tmp_path))
+
+    assert profiler.run_helper(query) == 42
+    assert profiler._helpers == {}
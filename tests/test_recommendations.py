@@ -0,0 +1,34 @@
+import numpy as np
+
+from utils.recommendations import WaterQualityRecommender
+
+IN_RANGE = {
+    'ph': 7.4, 'temperature': 38.0, 'turbidity': 1.0, 'orp': 700.0, 'conductivity': 600.0,
+    'free_chlorine': 2.0, 'total_chlorine': 3.0, 'bromine': 4.0, 'uv_intensity': 25.0,
+}
+
+
+def test_all_optimal_only_when_every_value_is_in_range():
+    recommendations = WaterQualityRecommender().get_recommendations(IN_RANGE)
+
+    assert [rec['status'] for rec in recommendations] == ['optimal']
+
+
+def test_missing_values_are_unknown_not_optimal():
+    readings = dict(IN_RANGE, orp=float('nan'), free_chlorine=None)
+
+    recommendations = WaterQualityRecommender().get_recommendations(readings)
+
+    assert [(rec['parameter'], rec['status']) for rec in recommendations] == [
+        ('ORP', 'unknown'), ('Free Chlorine', 'unknown')]
+
+
+def test_classify_arrays_counts_missing_samples_as_unknown():
+    columns = {sensor: np.full(3, value) for sensor, value in IN_RANGE.items()}
+    columns['ph'] = np.array([7.4, np.nan, 8.0])
+
+    triggered = WaterQualityRecommender().classify_arrays(columns)
+
+    assert triggered[('ph', 'unknown')].tolist() == [False, True, False]
+    assert triggered[('ph', 'high')].tolist() == [False, False, True]
+    assert triggered[('all', 'optimal')].tolist() == [True, False, False]
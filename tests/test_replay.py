@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from utils.recommendations import WaterQualityRecommender
+from utils.replay import ReplayEngine
+from utils.rules import DEFAULT_RULES, RuleEngine
+from utils.sensors import SENSOR_TYPES
+
+IN_RANGE = {
+    'ph': 7.4, 'temperature': 38.0, 'turbidity': 1.0, 'orp': 700.0, 'conductivity': 600.0,
+    'free_chlorine': 2.0, 'total_chlorine': 3.0, 'bromine': 4.0, 'uv_intensity': 25.0,
+}
+RULES = [
+    {'name': 'ph_high', 'label': 'pH', 'expr': 'ph', 'max': 7.8},
+    {'name': 'ph_sustained', 'label': 'pH', 'expr': 'ph', 'max': 7.8, 'for_seconds': 120},
+]
+
+
+def series():
+    """A minute of samples every 10 s, with pH high at 100-140 s, 300-490 s and from 550 s on."""
+    timestamps = np.datetime64('2024-05-01T12:00') + np.arange(60) * np.timedelta64(10, 's')
+    ph = np.full(60, 7.4)
+    ph[10:15] = ph[30:50] = ph[55:] = 8.0
+    columns = {sensor: np.full(60, value) for sensor, value in IN_RANGE.items()}
+    columns['ph'] = ph
+    return timestamps.astype('datetime64[us]'), columns
+
+
+def batched(size):
+    timestamps, columns = series()
+    for i in range(0, len(timestamps), size):
+        yield timestamps[i:i + size], {sensor: values[i:i + size] for sensor, values in columns.items()}
+
+
+def replay(size=60):
+    return ReplayEngine(RuleEngine(RULES), WaterQualityRecommender()).run(batched(size))
+
+
+def test_report_shows_stored_timestamps(new_york):
+    timestamps = np.array(['2024-03-10T01:30', '2024-03-10T05:00'], dtype='datetime64[us]')
+    columns = {sensor: np.full(2, 1.0) for sensor in SENSOR_TYPES}
+
+    report = ReplayEngine(RuleEngine(DEFAULT_RULES), WaterQualityRecommender()).run([(timestamps, columns)])
+
+    assert report['start'] == '2024-03-10T01:30:00'
+    assert report['end'] == '2024-03-10T05:00:00'
+    assert report['replayed_seconds'] == 3.5 * 3600
+
+
+def test_episodes_end_at_first_inactive_sample():
+    report = replay()
+
+    assert report['samples'] == 60
+    assert report['replayed_seconds'] == 590
+    # 100-150 s, 300-500 s, and 550 s to the end (590 s), still open
+    assert report['alerts']['ph_high'] == {
+        'count': 3, 'total_s': 290.0, 'longest_s': 200.0, 'ongoing': True, 'label': 'pH'}
+    # Only the middle breach lasts 120 s, so it is active from 420 s to 500 s
+    assert report['alerts']['ph_sustained'] == {
+        'count': 1, 'total_s': 80.0, 'longest_s': 80.0, 'label': 'pH'}
+
+
+@pytest.mark.parametrize('size', [1, 7, 13, 59])
+def test_report_does_not_depend_on_batch_size(size):
+    whole, split = replay(), replay(size)
+
+    assert split['alerts'] == whole['alerts']
+    assert split['recommendations'].keys() == whole['recommendations'].keys()
+    for key, rec in whole['recommendations'].items():
+        assert split['recommendations'][key]['samples'] == rec['samples']
+        assert split['recommendations'][key]['hours'] == pytest.approx(rec['hours'])
+
+
+def test_recommendation_shares_weighted_by_time_held():
+    recommendations = replay()['recommendations']
+
+    # Each sample holds until the next; the last one holds for no time
+    high = recommendations['ph:high']
+    assert (high['samples'], high['hours'] * 3600) == (30, pytest.approx(290.0))
+    assert high['share'] == pytest.approx(290 / 590)
+    optimal = recommendations['all:optimal']
+    assert (optimal['parameter'], optimal['samples']) == ('All Parameters', 30)
+    assert optimal['share'] == pytest.approx(300 / 590)
+    assert recommendations['ph:low']['samples'] == 0
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.rules import DEFAULT_RULES, RuleEngine, load_rules
+
+NORMAL = {'ph': 7.4, 'temperature': 38.0, 'turbidity': 1.0, 'orp': 700.0, 'conductivity': 500.0,
+          'free_chlorine': 2.0, 'total_chlorine': 2.3, 'bromine': 4.0, 'uv_intensity': 25.0}
+
+
+def test_unknown_sensor_is_rejected():
+    with pytest.raises(ValueError, match='phh'):
+        RuleEngine([{'name': 'ph', 'expr': 'phh', 'min': 7.0}])
+
+
+def test_unknown_rule_key_is_rejected(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps([{'name': 'ph', 'expr': 'ph', 'max': 7.8, 'for_minutes': 10}]))
+
+    with pytest.raises(ValueError, match='for_minutes'):
+        load_rules(str(path))
+    with pytest.raises(ValueError, match='for_minutes'):
+        RuleEngine(json.loads(path.read_text()))
+
+
+def test_missing_reading_is_reported_as_unknown():
+    engine = RuleEngine()
+    alerts = engine.evaluate(dict(NORMAL, ph=float('nan')), timestamp=0.0)
+
+    assert alerts['ph'] == (False, 'pH unknown: no reading', 'none')
+    assert alerts['orp_ph_consistency'][1] == 'pH-Adjusted ORP unknown: no reading'
+    assert alerts['temperature'] == (False, 'Temperature normal: 38.0 °C', 'none')
+
+
+def test_duration_rule_waits_for_sustained_breach():
+    engine = RuleEngine(DEFAULT_RULES)
+    state = engine.new_state()
+    high = dict(NORMAL, ph=8.0)
+
+    assert not engine.evaluate(high, timestamp=0.0, state=state)['ph_sustained_high'][0]
+    assert not engine.evaluate(high, timestamp=599.0, state=state)['ph_sustained_high'][0]
+    assert engine.evaluate(high, timestamp=600.0, state=state)['ph_sustained_high'] == \
+        (True, 'pH too high for 10 min: 8.0 pH', 'high')
+
+
+def test_array_evaluation_matches_streaming_across_batches():
+    engine = RuleEngine()
+    rng = np.random.default_rng(0)
+    seconds = np.arange(0.0, 3600.0, 10.0)
+    columns = {sensor: np.full(len(seconds), value) for sensor, value in NORMAL.items()}
+    columns['ph'] = 7.75 + 0.3 * np.sin(seconds / 300) + rng.normal(0, 0.01, len(seconds))
+
+    state = engine.new_state()
+    streamed = np.column_stack([
+        engine.check({sensor: column[i] for sensor, column in columns.items()}, seconds[i], state)[2]
+        for i in range(len(seconds))
+    ])
+    batch_state = engine.new_state()
+    batched = np.hstack([
+        engine.evaluate_arrays({sensor: column[i:i + 50] for sensor, column in columns.items()},
+                               seconds[i:i + 50], batch_state)['active']
+        for i in range(0, len(seconds), 50)
+    ])
+
+    assert streamed[engine.names.index('ph_sustained_high')].any()
+    np.testing.assert_array_equal(batched, streamed)
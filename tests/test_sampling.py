@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.calibration import CalibrationCurve, CalibrationHistory
+from utils.database import READING_COLUMNS, bucket_means, calibrate_rows, forward_fill
+from utils.sampling import DEFAULT_POLICIES, SamplingLoop, SamplingScheduler
+from utils.sensors import SensorSimulator
+
+
+def test_record_stores_only_moves_past_epsilon():
+    scheduler = SamplingScheduler({'ph': {'interval': 1, 'epsilon': 0.05, 'max_age': 300}})
+
+    assert scheduler.record({'ph': 7.40}, now=0) == {'ph': 7.40}
+    assert scheduler.record({'ph': 7.44}, now=1) == {}
+    # Measured from the last stored value, so slow drift is still stored
+    assert scheduler.record({'ph': 7.46}, now=2) == {'ph': 7.46}
+    assert scheduler.record({'ph': 7.42}, now=3) == {}
+    assert scheduler.latest == {'ph': 7.42}
+
+
+def test_record_stores_unchanged_value_after_max_age():
+    scheduler = SamplingScheduler({'ph': {'interval': 1, 'epsilon': 0.05, 'max_age': 300}})
+    scheduler.record({'ph': 7.4}, now=0)
+
+    assert scheduler.record({'ph': 7.4}, now=299) == {}
+    assert scheduler.record({'ph': 7.4}, now=300) == {'ph': 7.4}
+    assert scheduler.record({'ph': 7.4}, now=301) == {}
+
+
+def test_record_skips_missing_and_unknown_sensors():
+    scheduler = SamplingScheduler({'ph': {'interval': 5, 'epsilon': 0.05, 'max_age': 300}})
+
+    assert scheduler.record({'ph': None, 'mystery': 1.0}, now=0) == {}
+    # Not sampled, so still due
+    assert scheduler.due(now=1) == ['ph']
+
+
+def test_default_policies_cut_writes_by_an_order_of_magnitude():
+    # The baseline stored a full row every 5 s: 720 rows and 6,480 values an hour
+    simulator = SensorSimulator()
+    scheduler = SamplingScheduler(DEFAULT_POLICIES)
+    rows = values = 0
+    for now in range(3 * 3600):
+        due = scheduler.due(now)
+        if due:
+            readings = simulator.get_raw_readings(now)
+            stored = scheduler.record({sensor: readings[sensor] for sensor in due}, now)
+            rows += bool(stored)
+            values += len(stored)
+
+    assert rows / 3 < 720 / 5
+    assert values / 3 < 6480 / 10
+
+
+def test_forward_fill_carries_last_value_from_initial():
+    nan = np.nan
+    raw = np.array([[nan, 1.0],
+                    [7.2, nan],
+                    [nan, nan],
+                    [7.4, 3.0]])
+
+    filled = forward_fill(raw, initial=(7.0, nan))
+
+    assert np.allclose(filled, [[7.0, 1.0], [7.2, 1.0], [7.2, 1.0], [7.4, 3.0]], equal_nan=True)
+    # Without an initial value, leading gaps stay unknown
+    assert np.isnan(forward_fill(raw)[0, 0])
+
+
+def test_calibrate_rows_reconstructs_step_wise_series():
+    start = datetime(2024, 5, 1, 12, 0)
+    row = lambda minutes, **values: (start + timedelta(minutes=minutes),
+                                     *(values.get(column) for column in READING_COLUMNS))
+    rows = [row(0, temperature=38.0), row(1, ph_level=7.5), row(2), row(3, ph_level=7.3)]
+    initial = tuple(7.1 if column == 'ph_level' else None for column in READING_COLUMNS)
+    calibration = CalibrationHistory([
+        {'version': 1, 'sensor_type': 'ph', 'valid_from': start + timedelta(minutes=2),
+         'curve': CalibrationCurve([(7.0, 7.1)])},
+    ])
+
+    columns = calibrate_rows(rows, calibration, initial)
+
+    assert columns['timestamp'][1] == np.datetime64(start + timedelta(minutes=1))
+    # Held values are calibrated with the version in effect at each row
+    assert np.allclose(columns['ph_level'], [7.1, 7.5, 7.6, 7.4])
+    assert np.allclose(columns['temperature'], [38.0] * 4)
+    assert np.isnan(columns['orp_level']).all()
+
+
+def test_bucket_means_averages_per_minute():
+    timestamps = np.array(['2024-05-01T12:00:10', '2024-05-01T12:00:50', '2024-05-01T12:03:00'],
+                          dtype='datetime64[us]')
+    columns = {'timestamp': timestamps, 'ph_level': np.array([7.0, 7.4, np.nan])}
+
+    bucketed = bucket_means(columns, 60)
+
+    assert bucketed['timestamp'].tolist() == [datetime(2024, 5, 1, 12, 0), datetime(2024, 5, 1, 12, 3)]
+    assert bucketed['ph_level'][0] == 7.2
+    assert np.isnan(bucketed['ph_level'][1])
+
+
+def test_loop_samples_each_sensor_on_its_own_interval():
+    scheduler = SamplingScheduler({
+        'fast': {'interval': 0.05, 'epsilon': 0.0, 'max_age': 60},
+        'slow': {'interval': 0.3, 'epsilon': 0.0, 'max_age': 60},
+    })
+    reads = {'fast': 0, 'slow': 0}
+    stored = []
+    lock = threading.Lock()
+
+    def read(due):
+        with lock:
+            for sensor in due:
+                reads[sensor] += 1
+        return {sensor: float(reads[sensor]) for sensor in due}
+
+    loop = SamplingLoop(scheduler, read, stored.append)
+    assert loop.tick == 0.05
+    loop.start()
+    time.sleep(0.65)
+    loop.stop()
+
+    # No page reruns involved: the loop alone keeps both sensors sampled
+    assert 6 <= reads['fast'] <= 14
+    assert 2 <= reads['slow'] <= 3
+    assert scheduler.latest == {'fast': float(reads['fast']), 'slow': float(reads['slow'])}
+    assert sum('slow' in values for values in stored) == reads['slow']
+
+
+def test_loop_survives_read_failures():
+    scheduler = SamplingScheduler({'ph': {'interval': 0.02, 'epsilon': 0.0, 'max_age': 60}})
+    calls = []
+
+    def read(due):
+        calls.append(due)
+        if len(calls) == 1:
+            raise OSError("probe unplugged")
+        return {'ph': 7.2}
+
+    loop = SamplingLoop(scheduler, read, lambda values: None).start()
+    time.sleep(0.1)
+    loop.stop()
+
+    assert len(calls) > 1
+    assert scheduler.latest == {'ph': 7.2}
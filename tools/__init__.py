@@ -0,0 +1 @@
+# Operator tools run with `python -m tools.<name>`
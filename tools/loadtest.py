@@ -0,0 +1,317 @@
+"""Load and soak test for the dashboard.
+
+Starts the app against a scratch PostgreSQL cluster, opens N headless
+Streamlit sessions over the app's websocket, runs M simulated tubs writing
+readings, and reports refresh latency, database connections, CPU and memory
+growth of the server process.
+
+    python -m tools.loadtest --viewers 10 --tubs 5 --duration 600
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.database import Database, connect
+from utils.maintenance import MaintenanceScheduler
+from utils.sensors import SensorSimulator
+
+ROOT = Path(__file__).resolve().parent.parent
+# application_name of the app server's connections (via libpq's PGAPPNAME),
+# which tells them apart from the harness's own
+APP_NAME = 'hubsoak-loadtest-app'
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ScratchPostgres:
+    """Throwaway PostgreSQL cluster listening on a Unix socket in a temp dir."""
+
+    def __init__(self):
+        if not shutil.which('initdb') or not shutil.which('pg_ctl'):
+            raise RuntimeError("initdb/pg_ctl not found; install PostgreSQL or pass --use-env-db")
+        self.dir = tempfile.mkdtemp(prefix='hubsoak-pg-')
+        self.port = free_port()
+
+    def start(self) -> Dict[str, str]:
+        data = os.path.join(self.dir, 'data')
+        subprocess.run(['initdb', '-D', data, '-U', 'hubsoak', '--auth=trust'],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(['pg_ctl', '-D', data, '-w', '-l', os.path.join(self.dir, 'pg.log'),
+                        '-o', f"-p {self.port} -k {self.dir} -c listen_addresses=''", 'start'],
+                       check=True, stdout=subprocess.DEVNULL)
+        return {'PGHOST': self.dir, 'PGPORT': str(self.port), 'PGUSER': 'hubsoak',
+                'PGPASSWORD': '', 'PGDATABASE': 'postgres'}
+
+    def stop(self):
+        subprocess.run(['pg_ctl', '-D', os.path.join(self.dir, 'data'), '-m', 'fast', 'stop'],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class AppServer:
+    """The dashboard running under `streamlit run` in a child process."""
+
+    def __init__(self, env: Dict[str, str]):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', str(ROOT / 'main.py'),
+             '--server.port', str(self.port), '--server.address', '127.0.0.1',
+             '--server.headless', 'true', '--browser.gatherUsageStats', 'false'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Streamlit exited during startup")
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{self.port}/_stcore/health', timeout=1)
+                return
+            except OSError:
+                time.sleep(0.5)
+        raise RuntimeError("Streamlit did not become healthy in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class ProcessSampler:
+    """CPU and resident memory of a process, read from /proc."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self._ticks_per_second = os.sysconf('SC_CLK_TCK')
+        self._last = (time.time(), self._cpu_ticks())
+
+    def _cpu_ticks(self) -> int:
+        with open(f'/proc/{self.pid}/stat') as f:
+            # Skip past the command name, which may contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        return int(fields[11]) + int(fields[12])
+
+    def sample(self) -> Dict[str, float]:
+        now, ticks = time.time(), self._cpu_ticks()
+        last_time, last_ticks = self._last
+        self._last = (now, ticks)
+        cpu = (ticks - last_ticks) / self._ticks_per_second / max(now - last_time, 1e-6) * 100
+        with open(f'/proc/{self.pid}/status') as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        return {'cpu_percent': cpu, 'rss_mb': rss_kb / 1024}
+
+
+def count_db_connections() -> int:
+    """Connections the app server holds, leaving out the tubs and this monitor."""
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT count(*) FROM pg_stat_activity
+                WHERE datname = current_database() AND application_name = %s
+            """, (APP_NAME,))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def run_viewer(port: int, latencies: List[float], errors: List[str], stop: asyncio.Event):
+    """One headless browser session, timing each script run it receives.
+
+    A run's refresh latency is from its new_session message to its last
+    delta, taken when the run finishes or the next run starts, so the
+    refresh sleep at the end of a run is not counted.
+    """
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from tornado.websocket import websocket_connect
+
+    try:
+        ws = await websocket_connect(f'ws://127.0.0.1:{port}/_stcore/stream',
+                                     subprotocols=['streamlit'])
+    except Exception as e:
+        errors.append(f"connect: {e}")
+        return
+
+    request = BackMsg()
+    request.rerun_script.query_string = ''
+    ws.write_message(request.SerializeToString(), binary=True)
+
+    run_started: Optional[float] = None
+    last_delta: Optional[float] = None
+    while not stop.is_set():
+        try:
+            data = await asyncio.wait_for(ws.read_message(), 1.0)
+        except asyncio.TimeoutError:
+            continue
+        if data is None:
+            errors.append("session closed by server")
+            break
+
+        msg = ForwardMsg()
+        msg.ParseFromString(data)
+        kind = msg.WhichOneof('type')
+        now = time.perf_counter()
+        if kind in ('new_session', 'script_finished'):
+            if run_started is not None and last_delta is not None:
+                latencies.append(last_delta - run_started)
+            run_started, last_delta = (now if kind == 'new_session' else None), None
+        elif kind == 'delta':
+            last_delta = now
+    ws.close()
+
+
+def run_tub(db: Database, interval: float, stop: threading.Event, errors: List[str]):
+    """A simulated tub writing one raw reading per interval."""
+    simulator = SensorSimulator()
+    while not stop.is_set():
+        started = time.time()
+        try:
+            readings = simulator.get_raw_readings()
+            db.log_reading(
+                readings['ph'], readings['temperature'], readings['turbidity'],
+                readings['orp'], readings['conductivity'], readings['free_chlorine'],
+                readings['total_chlorine'], readings['bromine'], readings['uv_intensity']
+            )
+        except Exception as e:
+            errors.append(f"ingest: {e}")
+        stop.wait(max(0.0, interval - (time.time() - started)))
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'p50': float('nan'), 'p95': float('nan'), 'p99': float('nan')}
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return {'p50': p50, 'p95': p95, 'p99': p99}
+
+
+async def soak(args, server: AppServer) -> Dict:
+    sampler = ProcessSampler(server.process.pid)
+    stop_viewers = asyncio.Event()
+    stop_tubs = threading.Event()
+    latencies: List[float] = []
+    errors: List[str] = []
+    samples: List[Dict] = []
+
+    db = Database()
+    tubs = [threading.Thread(target=run_tub, args=(db, args.ingest_interval, stop_tubs, errors), daemon=True)
+            for _ in range(args.tubs)]
+    for tub in tubs:
+        tub.start()
+    viewers = [asyncio.ensure_future(run_viewer(server.port, latencies, errors, stop_viewers))
+               for _ in range(args.viewers)]
+
+    started = time.time()
+    while time.time() - started < args.duration:
+        await asyncio.sleep(args.sample_interval)
+        sample = {'elapsed_s': time.time() - started, 'refreshes': len(latencies)}
+        sample.update(sampler.sample())
+        try:
+            sample['db_connections'] = await asyncio.get_running_loop().run_in_executor(
+                None, count_db_connections)
+        except Exception as e:
+            sample['db_connections'] = None
+            errors.append(f"pg_stat_activity: {e}")
+        sample.update(percentiles(latencies[-max(args.viewers * 10, 1):]))
+        samples.append(sample)
+        print(f"[{sample['elapsed_s']:6.0f}s] refreshes={sample['refreshes']} "
+              f"p95={sample['p95']:.0f}ms cpu={sample['cpu_percent']:.0f}% "
+              f"rss={sample['rss_mb']:.1f}MB db_conns={sample['db_connections']}", flush=True)
+
+    stop_viewers.set()
+    stop_tubs.set()
+    await asyncio.gather(*viewers)
+
+    elapsed_h = np.array([s['elapsed_s'] for s in samples]) / 3600
+    rss = np.array([s['rss_mb'] for s in samples])
+    growth = float(np.polyfit(elapsed_h, rss, 1)[0]) if len(samples) >= 2 else 0.0
+    connections = [s['db_connections'] for s in samples if s['db_connections'] is not None]
+    return {
+        'viewers': args.viewers,
+        'tubs': args.tubs,
+        'duration_s': args.duration,
+        'refreshes': len(latencies),
+        'latency_ms': percentiles(latencies),
+        'db_connections_max': max(connections) if connections else None,
+        'cpu_percent_mean': float(np.mean([s['cpu_percent'] for s in samples])) if samples else None,
+        'rss_mb_start': float(rss[0]) if len(rss) else None,
+        'rss_mb_end': float(rss[-1]) if len(rss) else None,
+        'rss_growth_mb_per_hour': growth,
+        'errors': sorted(set(errors)),
+        'samples': samples,
+    }
+
+
+def print_report(report: Dict):
+    latency = report['latency_ms']
+    print()
+    print(f"Viewers: {report['viewers']}  Tubs: {report['tubs']}  Duration: {report['duration_s']}s")
+    print(f"Refreshes: {report['refreshes']}")
+    print(f"Refresh latency: p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, "
+          f"p99 {latency['p99']:.0f} ms")
+    print(f"DB connections (max): {report['db_connections_max']}")
+    print(f"CPU (mean): {report['cpu_percent_mean']:.0f}%")
+    print(f"Memory: {report['rss_mb_start']:.1f} MB -> {report['rss_mb_end']:.1f} MB "
+          f"({report['rss_growth_mb_per_hour']:+.1f} MB/hour)")
+    for error in report['errors']:
+        print(f"Error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--viewers', type=int, default=5, help="Concurrent dashboard sessions")
+    parser.add_argument('--tubs', type=int, default=1, help="Simulated tubs writing readings")
+    parser.add_argument('--duration', type=float, default=120, help="Seconds to run")
+    parser.add_argument('--ingest-interval', type=float, default=1.0, help="Seconds between tub writes")
+    parser.add_argument('--sample-interval', type=float, default=10.0, help="Seconds between resource samples")
+    parser.add_argument('--use-env-db', action='store_true',
+                        help="Use the database in the PG* environment instead of a scratch cluster")
+    parser.add_argument('--json', help="Also write the full report, with samples, to this file")
+    args = parser.parse_args()
+
+    scratch = None if args.use_env_db else ScratchPostgres()
+    server = None
+    try:
+        if scratch:
+            os.environ.update(scratch.start())
+        # Create the schema once, before the app and the tubs start, since
+        # concurrent CREATE TABLE IF NOT EXISTS can fail on a fresh cluster
+        Database().ensure_schema()
+        MaintenanceScheduler().ensure_schema()
+        server = AppServer(dict(os.environ, PGAPPNAME=APP_NAME))
+        server.wait_ready()
+        report = asyncio.run(soak(args, server))
+    finally:
+        if server:
+            server.stop()
+        if scratch:
+            scratch.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
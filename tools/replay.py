@@ -0,0 +1,59 @@
+"""Replay stored readings through the alert rules and recommendations.
+
+Reads history from the database (PG* environment) or a CSV/Parquet export,
+evaluates it in batches on a virtual clock and reports how often each alert
+fired and each recommendation applied. Use it to try threshold changes
+against past data before deploying them.
+
+    python -m tools.replay --days 30
+    python -m tools.replay --file export.csv --rules rules.json --ranges ranges.json
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+from utils.database import Database
+from utils.recommendations import WaterQualityRecommender
+from utils.replay import ReplayEngine, database_batches, file_batches, format_report
+from utils.rules import DEFAULT_RULES, RuleEngine, load_rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--file', help="CSV or Parquet export to replay instead of the database")
+    parser.add_argument('--days', type=float, default=30, help="Days of history to replay from the database")
+    parser.add_argument('--start', type=datetime.fromisoformat, help="Replay from this time (ISO format)")
+    parser.add_argument('--end', type=datetime.fromisoformat, help="Replay up to this time (ISO format)")
+    parser.add_argument('--rules', default=os.environ.get('HUBSOAK_RULES'),
+                        help="Alert rules JSON to evaluate (default: HUBSOAK_RULES, as the dashboard uses)")
+    parser.add_argument('--ranges', help="JSON of optimal range overrides, e.g. {\"ph\": {\"max\": 7.6}}")
+    parser.add_argument('--speed', type=float,
+                        help="Replay at this multiple of real time (default: as fast as possible)")
+    parser.add_argument('--batch-size', type=int, default=50000, help="Readings per batch")
+    parser.add_argument('--json', help="Also write the full report to this file")
+    args = parser.parse_args()
+
+    recommender = WaterQualityRecommender()
+    if args.ranges:
+        with open(args.ranges) as f:
+            for sensor, bounds in json.load(f).items():
+                recommender.optimal_ranges[sensor].update(bounds)
+    engine = ReplayEngine(RuleEngine(load_rules(args.rules) if args.rules else DEFAULT_RULES),
+                          recommender, args.speed)
+
+    if args.file:
+        batches = file_batches(args.file, args.batch_size)
+    else:
+        start = args.start or (args.end or datetime.now()) - timedelta(days=args.days)
+        batches = database_batches(Database(), start, args.end, args.batch_size)
+
+    report = engine.run(batches)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
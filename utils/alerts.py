@@ -8,12 +8,15 @@ class AlertSystem:
     def process_alerts(self, alerts: Dict[str, tuple]):
         current_alerts = []
         
-        for sensor, (is_alert, message) in alerts.items():
+        for sensor, alert in alerts.items():
+            is_alert, message = alert[0], alert[1]
             if is_alert:
                 current_alerts.append({
                     'sensor': sensor,
                     'message': message,
-                    'severity': 'high' if 'too high' in message else 'low'
+                    # Rule alerts carry their own severity
+                    'severity': alert[2] if len(alert) > 2 else
+                                ('high' if 'too high' in message else 'low')
                 })
                 
         if current_alerts:
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from utils.database import Database, calibrate_rows
+from utils.maintenance import MaintenanceScheduler
+from utils.profiling import RerunProfiler
+
+logger = logging.getLogger(__name__)
+
+class AsyncStorage:
+    """Asyncio access to the readings and maintenance stores.
+
+    Each query runs in a worker thread on its own pooled connection, so
+    queries gathered together overlap and a page waits only for the slowest
+    one. Writes are queued and flushed by a single writer task, which sends
+    everything queued since its last flush in one transaction. The loop runs
+    on a dedicated thread; the synchronous methods are for the Streamlit
+    script thread. Given a profiler, queries are covered by its captures.
+    """
+
+    def __init__(self, db: Database, maintenance: MaintenanceScheduler,
+                 workers: int = 8, max_pending: int = 10000,
+                 profiler: Optional[RerunProfiler] = None):
+        self.db = db
+        self.maintenance = maintenance
+        self.max_pending = max_pending
+        self.profiler = profiler
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='storage')
+        self._pending: List[Tuple[datetime, Dict[str, float]]] = []
+        self._wake = asyncio.Event()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='storage', daemon=True).start()
+        self._writer = asyncio.run_coroutine_threadsafe(self._write_forever(), self._loop)
+
+    async def _run(self, func, *args):
+        if self.profiler is not None:
+            func, args = self.profiler.run_helper, (func, *args)
+        return await self._loop.run_in_executor(self._executor, func, *args)
+
+    async def fetch_historical_data(self, hours: float = 24) -> Dict:
+        """Database.get_historical_data, with its three queries run concurrently."""
+        start = datetime.now() - timedelta(hours=hours)
+        rows, calibration, initial = await asyncio.gather(
+            self._run(self.db.get_raw_history, start),
+            self._run(self.db.get_calibration_history),
+            self._run(self.db.get_last_values, start)
+        )
+        return calibrate_rows(rows, calibration, initial)
+
+    async def fetch_upcoming_tasks(self, days_ahead: int = 7) -> List[Dict]:
+        return await self._run(self.maintenance.get_upcoming_tasks, days_ahead)
+
+    async def fetch_tasks_with_history(self, days_ahead: int = 7,
+                                       per_task: int = 10) -> Tuple[List[Dict], Dict[int, List[Dict]]]:
+        """Upcoming tasks, then the recent history of just those tasks."""
+        tasks = await self.fetch_upcoming_tasks(days_ahead)
+        history = await self._run(self.maintenance.get_recent_task_history,
+                                  [task['id'] for task in tasks], per_task)
+        return tasks, history
+
+    async def fetch_dashboard(self, history_hours: Optional[float] = 12, task_days: int = 365) -> Dict:
+        """Everything one dashboard rerun reads, fetched concurrently.
+
+        Returns 'history' (None when history_hours is None), 'upcoming_tasks'
+        due within task_days, and 'task_history' of those tasks keyed by
+        task id. A read that fails holds its exception instead, without
+        failing the others.
+        """
+        history, maintenance = await asyncio.gather(
+            self.fetch_historical_data(history_hours) if history_hours is not None else asyncio.sleep(0),
+            self.fetch_tasks_with_history(task_days),
+            return_exceptions=True
+        )
+        tasks, task_history = (maintenance, maintenance) if isinstance(maintenance, Exception) else maintenance
+        return {'history': history, 'upcoming_tasks': tasks, 'task_history': task_history}
+
+    async def write_values(self, values: Dict[str, float], timestamp: Optional[datetime] = None):
+        """Queue raw values for the writer; returns without waiting for the database."""
+        self._pending.append((timestamp or datetime.now(), values))
+        if len(self._pending) > self.max_pending:
+            logger.warning("Write queue full, dropping %d oldest readings",
+                           len(self._pending) - self.max_pending)
+            del self._pending[:-self.max_pending]
+        self._wake.set()
+
+    async def flush(self):
+        """Write everything queued so far in one transaction."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            # Background writes are not part of any rerun, so not profiled
+            await self._loop.run_in_executor(self._executor, self.db.log_many, batch)
+        except Exception as e:
+            # Kept for the next flush
+            logger.warning("Writing %d readings failed: %s", len(batch), e)
+            self._pending = (batch + self._pending)[-self.max_pending:]
+
+    async def _write_forever(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await self.flush()
+
+    def submit(self, coro) -> Future:
+        """Start a coroutine on the storage loop and return its future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def log_values(self, values: Dict[str, float], timestamp: Optional[datetime] = None):
+        """Synchronous, non-blocking counterpart of write_values."""
+        self.submit(self.write_values(values, timestamp or datetime.now()))
+
+    def load_dashboard(self, history_hours: Optional[float] = 12, task_days: int = 365) -> Dict:
+        """Synchronous wrapper around fetch_dashboard."""
+        return self.submit(self.fetch_dashboard(history_hours, task_days)).result()
+
+    def close(self):
+        """Flush queued writes and stop the loop."""
+        self.submit(self.flush()).result()
+        self._writer.cancel()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._executor.shutdown()
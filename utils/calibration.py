@@ -0,0 +1,119 @@
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+class CalibrationCurve:
+    """Piecewise-linear mapping from raw sensor values to calibrated values.
+
+    No points is the identity, one point is a pure offset, and two or more
+    points are interpolated, with the end segments extended beyond the
+    calibrated range.
+    """
+
+    def __init__(self, points: Sequence[Tuple[float, float]] = ()):
+        self.points = sorted((float(raw), float(actual)) for raw, actual in points)
+        self._raw = np.array([p[0] for p in self.points])
+        self._actual = np.array([p[1] for p in self.points])
+        if len(self._raw) != len(np.unique(self._raw)):
+            raise ValueError("Calibration points must have distinct raw values")
+
+    @classmethod
+    def from_offset_scale(cls, offset: float, scale: float) -> 'CalibrationCurve':
+        """Build the curve equivalent to (raw + offset) * scale."""
+        return cls([(0.0, offset * scale), (1.0, (1.0 + offset) * scale)])
+
+    @classmethod
+    def from_json(cls, text: str) -> 'CalibrationCurve':
+        return cls(json.loads(text))
+
+    def to_json(self) -> str:
+        return json.dumps(self.points)
+
+    def apply(self, raw):
+        """Calibrate a scalar or array of raw values."""
+        raw = np.asarray(raw, dtype=float)
+        if len(self.points) == 0:
+            return raw.copy()
+        if len(self.points) == 1:
+            return raw + (self._actual[0] - self._raw[0])
+
+        calibrated = np.interp(raw, self._raw, self._actual)
+        low_slope = (self._actual[1] - self._actual[0]) / (self._raw[1] - self._raw[0])
+        high_slope = (self._actual[-1] - self._actual[-2]) / (self._raw[-1] - self._raw[-2])
+        calibrated = np.where(raw < self._raw[0],
+                              self._actual[0] + (raw - self._raw[0]) * low_slope, calibrated)
+        calibrated = np.where(raw > self._raw[-1],
+                              self._actual[-1] + (raw - self._raw[-1]) * high_slope, calibrated)
+        return calibrated
+
+
+class CalibrationHistory:
+    """Every calibration version recorded for each sensor.
+
+    The calibration in effect at a timestamp is the highest version whose
+    valid_from is at or before it, so a new version with a backdated
+    valid_from recalibrates all history from that point on.
+    """
+
+    def __init__(self, versions: List[Dict]):
+        # versions: dicts with sensor_type, version, valid_from and curve
+        self._by_sensor: Dict[str, List[Dict]] = {}
+        for entry in sorted(versions, key=lambda v: v['version']):
+            self._by_sensor.setdefault(entry['sensor_type'], []).append(entry)
+
+    def current(self, now: Optional[datetime] = None) -> Dict[str, CalibrationCurve]:
+        """Get the calibration curve in effect now for each sensor that has one."""
+        now = now or datetime.now()
+        curves = {}
+        for sensor, entries in self._by_sensor.items():
+            in_effect = [entry for entry in entries if entry['valid_from'] <= now]
+            if in_effect:
+                curves[sensor] = in_effect[-1]['curve']
+        return curves
+
+    def next_change(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """When the next future-dated version takes effect, if there is one."""
+        now = now or datetime.now()
+        upcoming = [entry['valid_from'] for entries in self._by_sensor.values()
+                    for entry in entries if entry['valid_from'] > now]
+        return min(upcoming) if upcoming else None
+
+    def apply(self, sensor_type: str, timestamps, raw) -> np.ndarray:
+        """Calibrate raw values using the version in effect at each timestamp."""
+        raw = np.asarray(raw, dtype=float)
+        entries = self._by_sensor.get(sensor_type)
+        if not entries:
+            return raw.copy()
+
+        timestamps = np.asarray(timestamps, dtype='datetime64[us]')
+        in_effect = np.full(len(raw), -1)
+        for i, entry in enumerate(entries):
+            in_effect[timestamps >= np.datetime64(entry['valid_from'], 'us')] = i
+
+        calibrated = raw.copy()
+        for i in np.unique(in_effect[in_effect >= 0]):
+            mask = in_effect == i
+            calibrated[mask] = entries[i]['curve'].apply(raw[mask])
+        return calibrated
+
+
+def parse_points(text: str) -> List[Tuple[float, float]]:
+    """Parse calibration points written one per line as 'raw = actual'."""
+    points = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            raw, actual = line.split('=')
+            point = (float(raw), float(actual))
+        except ValueError:
+            raise ValueError(f"Invalid calibration point '{line}', expected 'raw = actual'")
+        if not np.all(np.isfinite(point)):
+            raise ValueError(f"Invalid calibration point '{line}', values must be finite numbers")
+        points.append(point)
+    if not points:
+        raise ValueError("Enter at least one calibration point")
+    return points
@@ -1,44 +1,204 @@
 import os
-import psycopg2
-from datetime import datetime
-from typing import Dict, List, Tuple
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
 from contextlib import contextmanager
 
-class Database:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.environ['PGDATABASE'],
-            user=os.environ['PGUSER'],
-            password=os.environ['PGPASSWORD'],
-            host=os.environ['PGHOST'],
-            port=os.environ['PGPORT']
-        )
-        self._create_tables()
+import numpy as np
 
-    @contextmanager
-    def get_cursor(self):
-        """Context manager for database operations that handles transactions."""
-        cursor = self.conn.cursor()
+from utils import startup
+from utils.calibration import CalibrationCurve, CalibrationHistory
+
+# Timestamps are naive local times from this process's clock (datetime.now()),
+# always passed explicitly rather than left to the database's NOW(), so
+# windows, readings and calibration versions are all on one clock.
+
+# Reading columns in table order, and the sensor each one stores
+READING_COLUMNS = ['ph_level', 'temperature', 'turbidity', 'orp_level', 'conductivity',
+                   'free_chlorine', 'total_chlorine', 'bromine', 'uv_intensity']
+COLUMN_SENSORS = {column: column.replace('_level', '') for column in READING_COLUMNS}
+
+def _connection_params() -> Dict[str, str]:
+    return {
+        'dbname': os.environ['PGDATABASE'],
+        'user': os.environ['PGUSER'],
+        'password': os.environ['PGPASSWORD'],
+        'host': os.environ['PGHOST'],
+        'port': os.environ['PGPORT'],
+    }
+
+def connect():
+    """Open a new PostgreSQL connection from the PG* environment variables."""
+    # psycopg2 is imported here so that loading this module stays cheap
+    psycopg2 = startup.lazy_import('psycopg2')
+    return psycopg2.connect(**_connection_params())
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """The connection pool shared by every store, created on first use.
+
+    Holds up to HUBSOAK_DB_POOL_SIZE connections (default 8).
+    """
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = startup.lazy_import('psycopg2.pool')
+                size = int(os.environ.get('HUBSOAK_DB_POOL_SIZE', 8))
+                _pool_slots = threading.BoundedSemaphore(size)
+                _pool = pool.ThreadedConnectionPool(1, size, **_connection_params())
+    return _pool
+
+@contextmanager
+def pooled_connection():
+    """Borrow a pooled connection, committing on success and rolling back on error.
+
+    Waits for a free connection when all of them are in use.
+    """
+    pool = get_pool()
+    with _pool_slots:
+        conn = pool.getconn()
         try:
-            yield cursor
-            self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
         finally:
-            cursor.close()
+            pool.putconn(conn, close=bool(conn.closed))
+
+def forward_fill(raw: np.ndarray, initial: Optional[Tuple] = None) -> np.ndarray:
+    """Carry each column's last non-NaN value forward over NaN gaps.
+
+    `initial` holds each column's last value before the first row.
+    """
+    if initial is not None:
+        raw = np.vstack([np.array(initial, dtype=float), raw])
+    rows = np.arange(len(raw))[:, None]
+    last_valid = np.maximum.accumulate(np.where(np.isnan(raw), 0, rows), axis=0)
+    filled = raw[last_valid, np.arange(raw.shape[1])]
+    return filled[1:] if initial is not None else filled
+
+def local_epoch_seconds(timestamps) -> np.ndarray:
+    """Convert naive local datetime64 values to Unix epoch seconds.
+
+    The UTC offset is looked up once per distinct hour, which follows
+    daylight saving changes without a per-row conversion.
+    """
+    naive = np.asarray(timestamps, dtype='datetime64[us]').astype('int64') / 1e6
+    if not len(naive):
+        return naive
+    hours, index = np.unique(naive // 3600 * 3600, return_inverse=True)
+    offsets = np.array([hour - time.mktime(time.gmtime(hour)[:8] + (-1,)) for hour in hours])
+    return naive - offsets[index]
+
+def calibrate_rows(rows: List[Tuple], calibration: CalibrationHistory,
+                   initial: Optional[Tuple] = None) -> Dict[str, np.ndarray]:
+    """Turn raw (timestamp, *READING_COLUMNS) rows into calibrated columns.
+
+    NULL means the sensor had not moved past its deadband, so the last
+    stored value is carried forward, starting from `initial` if given.
+    """
+    timestamps = np.array([row[0] for row in rows], dtype='datetime64[us]')
+    # None (no value) becomes NaN so whole columns stay float arrays
+    raw = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), len(READING_COLUMNS))
+    raw = forward_fill(raw, initial)
+    columns = {'timestamp': timestamps}
+    for i, column in enumerate(READING_COLUMNS):
+        columns[column] = calibration.apply(COLUMN_SENSORS[column], timestamps, raw[:, i])
+    return columns
+
+def bucket_means(columns: Dict[str, np.ndarray], bucket_seconds: int = 60) -> Dict[str, np.ndarray]:
+    """Average each column over fixed time buckets, to plot long windows.
+
+    Buckets are labelled with their start time; empty buckets are left out,
+    and a bucket with no values for a column holds NaN there.
+    """
+    seconds = np.asarray(columns['timestamp'], dtype='datetime64[s]').astype('int64')
+    starts, index = np.unique(seconds // bucket_seconds * bucket_seconds, return_inverse=True)
+    bucketed = {'timestamp': starts.astype('datetime64[s]').astype('datetime64[us]')}
+    for column, values in columns.items():
+        if column == 'timestamp':
+            continue
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        totals = np.bincount(index[valid], weights=values[valid], minlength=len(starts))
+        counts = np.bincount(index[valid], minlength=len(starts))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bucketed[column] = totals / counts
+    return bucketed
+
+class LazySchema:
+    """Connection and schema setup for a store, deferred until first use.
+
+    Subclasses implement _create_tables(conn); `store_name` labels their
+    startup timings and warm-up thread.
+    """
+
+    store_name = 'store'
+
+    def __init__(self):
+        # The schema check is deferred until first use
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def ensure_schema(self):
+        """Connect and create tables on first use."""
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    with startup.measure(f'{self.store_name} connect'):
+                        get_pool()
+                    with startup.measure(f'{self.store_name} schema'), pooled_connection() as conn:
+                        self._create_tables(conn)
+                    self._ready = True
+
+    def warm_up(self):
+        """Establish the connection on a background thread."""
+        threading.Thread(target=self._warm_up, name=f'{self.store_name}-warm-up', daemon=True).start()
+
+    def _warm_up(self):
+        try:
+            self.ensure_schema()
+        except Exception:
+            # Left for the first real query to retry and report
+            pass
+
+    def _create_tables(self, conn):
+        raise NotImplementedError
+
+class Database(LazySchema):
+    store_name = 'database'
+
+    @contextmanager
+    def get_cursor(self, name: Optional[str] = None):
+        """Context manager for database operations that handles transactions.
+
+        Each call borrows its own pooled connection, so calls from different
+        threads run concurrently. A name opens a server-side cursor, which
+        streams large results.
+        """
+        self.ensure_schema()
+        with pooled_connection() as conn:
+            cursor = conn.cursor(name)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
 
-    def _create_tables(self):
+    def _create_tables(self, conn):
         """Create necessary database tables if they don't exist."""
+        psycopg2 = startup.lazy_import('psycopg2')
         try:
-            with self.get_cursor() as cur:
-                # Drop existing tables to ensure clean state
+            with conn.cursor() as cur:
                 cur.execute("""
-                    DROP TABLE IF EXISTS sensor_readings CASCADE;
-                    DROP TABLE IF EXISTS sensor_calibration CASCADE;
-
-                    -- Create sensor readings table
-                    CREATE TABLE sensor_readings (
+                    -- Sensor readings hold raw values; calibration is applied on read
+                    CREATE TABLE IF NOT EXISTS sensor_readings (
                         id SERIAL PRIMARY KEY,
                         timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         ph_level FLOAT,
@@ -52,34 +212,24 @@ class Database:
                         uv_intensity FLOAT DEFAULT 0.0
                     );
 
-                    -- Create sensor calibration table with unique constraint
-                    CREATE TABLE sensor_calibration (
-                        id SERIAL PRIMARY KEY,
-                        sensor_type VARCHAR(50) UNIQUE,
-                        offset_value FLOAT,
-                        scale_factor FLOAT,
-                        last_calibrated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    CREATE INDEX IF NOT EXISTS sensor_readings_timestamp_idx
+                        ON sensor_readings (timestamp);
+
+                    -- Every calibration ever applied, as JSON [raw, actual] points
+                    CREATE TABLE IF NOT EXISTS calibration_history (
+                        version SERIAL PRIMARY KEY,
+                        sensor_type VARCHAR(50) NOT NULL,
+                        points TEXT NOT NULL,
+                        valid_from TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     );
 
-                    -- Initialize default calibration values
-                    INSERT INTO sensor_calibration (sensor_type, offset_value, scale_factor)
-                    VALUES 
-                        ('ph', 0.0, 1.0),
-                        ('temperature', 0.0, 1.0),
-                        ('turbidity', 0.0, 1.0),
-                        ('orp', 0.0, 1.0),
-                        ('conductivity', 0.0, 1.0),
-                        ('free_chlorine', 0.0, 1.0),
-                        ('total_chlorine', 0.0, 1.0),
-                        ('bromine', 0.0, 1.0),
-                        ('uv_intensity', 0.0, 1.0)
-                    ON CONFLICT (sensor_type) 
-                    DO UPDATE SET 
-                        offset_value = EXCLUDED.offset_value,
-                        scale_factor = EXCLUDED.scale_factor,
-                        last_calibrated = CURRENT_TIMESTAMP;
+                    -- Superseded by calibration_history
+                    DROP TABLE IF EXISTS sensor_calibration;
                 """)
+            conn.commit()
         except psycopg2.Error as e:
+            conn.rollback()
             raise Exception(f"Database error creating tables: {str(e)}")
         except Exception as e:
             raise Exception(f"Unexpected error creating tables: {str(e)}")
@@ -87,56 +237,131 @@ class Database:
     def log_reading(self, ph: float, temp: float, turbidity: float, orp: float, 
                    conductivity: float, free_chlorine: float, total_chlorine: float, 
                    bromine: float, uv_intensity: float):
-        """Log a sensor reading to the database."""
+        """Log a raw (uncalibrated) sensor reading to the database."""
         try:
             with self.get_cursor() as cur:
                 cur.execute(
                     """INSERT INTO sensor_readings 
                        (ph_level, temperature, turbidity, orp_level, conductivity, 
-                        free_chlorine, total_chlorine, bromine, uv_intensity) 
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+                        free_chlorine, total_chlorine, bromine, uv_intensity, timestamp) 
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
                     (ph, temp, turbidity, orp, conductivity, free_chlorine, 
-                     total_chlorine, bromine, uv_intensity)
+                     total_chlorine, bromine, uv_intensity, datetime.now())
                 )
         except Exception as e:
             raise Exception(f"Error logging sensor reading: {str(e)}")
 
-    def get_historical_data(self, hours: int = 24) -> List[Tuple]:
-        """Retrieve historical sensor data for the specified number of hours."""
+    def log_values(self, values: Dict[str, float], timestamp: Optional[datetime] = None):
+        """Log raw values for some sensors; the others are stored as NULL (unchanged)."""
+        self.log_many([(timestamp or datetime.now(), values)])
+
+    def log_many(self, readings: List[Tuple[datetime, Dict[str, float]]]):
+        """Log several timestamped sets of raw values in one transaction."""
+        extras = startup.lazy_import('psycopg2.extras')
         try:
             with self.get_cursor() as cur:
-                cur.execute("""
-                    SELECT timestamp, ph_level, temperature, turbidity, orp_level, 
-                           conductivity, free_chlorine, total_chlorine, bromine,
-                           uv_intensity
-                    FROM sensor_readings 
-                    WHERE timestamp > NOW() - INTERVAL '%s hours'
-                    ORDER BY timestamp DESC
-                """, (hours,))
+                extras.execute_values(
+                    cur,
+                    f"INSERT INTO sensor_readings (timestamp, {', '.join(READING_COLUMNS)}) VALUES %s",
+                    [(timestamp, *(values.get(COLUMN_SENSORS[column]) for column in READING_COLUMNS))
+                     for timestamp, values in readings]
+                )
+        except Exception as e:
+            raise Exception(f"Error logging sensor reading: {str(e)}")
+
+    def get_last_values(self, before: datetime) -> Tuple:
+        """Get each reading column's last stored raw value at or before a time."""
+        try:
+            with self.get_cursor() as cur:
+                cur.execute("SELECT " + ", ".join(f"""
+                    (SELECT {column} FROM sensor_readings
+                     WHERE timestamp <= %(before)s AND {column} IS NOT NULL
+                     ORDER BY timestamp DESC LIMIT 1)""" for column in READING_COLUMNS),
+                    {'before': before})
+                return cur.fetchone()
+        except Exception as e:
+            raise Exception(f"Error retrieving historical data: {str(e)}")
+
+    def get_raw_history(self, start: datetime, end: Optional[datetime] = None) -> List[Tuple]:
+        """Retrieve raw sensor rows between two timestamps, oldest first."""
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(f"""
+                    SELECT timestamp, {', '.join(READING_COLUMNS)}
+                    FROM sensor_readings
+                    WHERE timestamp > %s AND timestamp <= %s
+                    ORDER BY timestamp ASC
+                """, (start, end or datetime.now()))
                 return cur.fetchall()
         except Exception as e:
             raise Exception(f"Error retrieving historical data: {str(e)}")
 
-    def update_calibration(self, sensor_type: str, offset: float, scale: float):
-        """Update calibration values for a specific sensor."""
+    def iter_raw_history(self, start: datetime, end: Optional[datetime] = None,
+                         batch_size: int = 50000) -> Iterator[List[Tuple]]:
+        """Stream raw sensor rows between two timestamps in batches, oldest first."""
+        try:
+            with self.get_cursor(name='raw_history') as cur:
+                cur.execute(f"""
+                    SELECT timestamp, {', '.join(READING_COLUMNS)}
+                    FROM sensor_readings
+                    WHERE timestamp > %s AND timestamp <= %s
+                    ORDER BY timestamp ASC
+                """, (start, end or datetime.now()))
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+        except Exception as e:
+            raise Exception(f"Error retrieving historical data: {str(e)}")
+
+    def get_historical_data(self, hours: int = 24) -> Dict[str, np.ndarray]:
+        """Retrieve calibrated sensor data for the specified number of hours.
+
+        Returns a column per reading plus 'timestamp', oldest first, with
+        deadband gaps filled step-wise from the last stored value.
+        """
+        start = datetime.now() - timedelta(hours=hours)
+        rows = self.get_raw_history(start)
+        return calibrate_rows(rows, self.get_calibration_history(), self.get_last_values(start))
+
+    def get_calibration_history(self) -> CalibrationHistory:
+        """Retrieve every recorded calibration version."""
         try:
             with self.get_cursor() as cur:
                 cur.execute("""
-                    INSERT INTO sensor_calibration (sensor_type, offset_value, scale_factor)
+                    SELECT version, sensor_type, points, valid_from
+                    FROM calibration_history
+                    ORDER BY version ASC
+                """)
+                return CalibrationHistory([
+                    {
+                        'version': row[0],
+                        'sensor_type': row[1],
+                        'curve': CalibrationCurve.from_json(row[2]),
+                        'valid_from': row[3]
+                    }
+                    for row in cur.fetchall()
+                ])
+        except Exception as e:
+            raise Exception(f"Error retrieving calibration: {str(e)}")
+
+    def set_calibration(self, sensor_type: str, curve: CalibrationCurve,
+                        valid_from: Optional[datetime] = None):
+        """Record a new calibration version for a sensor.
+
+        A valid_from in the past recalibrates all stored readings from then on
+        in a single insert, since calibration is applied when data is read.
+        """
+        try:
+            with self.get_cursor() as cur:
+                cur.execute("""
+                    INSERT INTO calibration_history (sensor_type, points, valid_from)
                     VALUES (%s, %s, %s)
-                    ON CONFLICT (sensor_type)
-                    DO UPDATE SET 
-                        offset_value = EXCLUDED.offset_value,
-                        scale_factor = EXCLUDED.scale_factor,
-                        last_calibrated = CURRENT_TIMESTAMP
-                """, (sensor_type, offset, scale))
+                """, (sensor_type, curve.to_json(), valid_from or datetime.now()))
         except Exception as e:
             raise Exception(f"Error updating calibration: {str(e)}")
 
-    def __del__(self):
-        """Ensure database connection is closed when object is destroyed."""
-        if hasattr(self, 'conn'):
-            try:
-                self.conn.close()
-            except:
-                pass
+    def update_calibration(self, sensor_type: str, offset: float, scale: float):
+        """Update calibration values for a specific sensor."""
+        self.set_calibration(sensor_type, CalibrationCurve.from_offset_scale(offset, scale))
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import random
+import termios
+import tty
+
+class SensorDriver(ABC):
+    """A single probe that is read asynchronously.
+
+    Transports (serial, Modbus, I2C) subclass this and implement _read().
+    """
+
+    def __init__(self, sensor_type: str):
+        self.sensor_type = sensor_type
+        # Probes answer one command at a time
+        self._lock = asyncio.Lock()
+
+    async def read(self) -> float:
+        async with self._lock:
+            return await self._read()
+
+    @abstractmethod
+    async def _read(self) -> float:
+        """Take one reading from the probe."""
+
+    def close(self):
+        pass
+
+
+class SimulatedProbe(SensorDriver):
+    """In-memory fake probe that answers after a realistic delay."""
+
+    def __init__(self, sensor_type: str, low: float, high: float,
+                 latency: float = 0.05, failure_rate: float = 0.0):
+        super().__init__(sensor_type)
+        self.low = low
+        self.high = high
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    async def _read(self) -> float:
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.failure_rate:
+            raise IOError(f"Simulated {self.sensor_type} probe did not respond")
+        return random.uniform(self.low, self.high)
+
+
+class SerialProbe(SensorDriver):
+    """Probe speaking a line-based ASCII protocol over a serial port.
+
+    A command such as 'R' (Atlas Scientific EZO style) is sent terminated by a
+    carriage return, and the first numeric reply line is the reading. Status
+    lines starting with '*' are skipped, except '*ER' which is an error.
+    Works the same against a pseudo-terminal, which is how the tests attach
+    fake devices.
+    """
+
+    BAUD_RATES = {
+        9600: termios.B9600,
+        19200: termios.B19200,
+        38400: termios.B38400,
+        57600: termios.B57600,
+        115200: termios.B115200,
+    }
+
+    def __init__(self, sensor_type: str, port: str, command: str = 'R', baudrate: int = 9600):
+        super().__init__(sensor_type)
+        self.port = port
+        self.command = command
+        self.baudrate = baudrate
+        self._fd = None
+        self._buffer = b''
+
+    def _open(self):
+        fd = os.open(self.port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            tty.setraw(fd)
+            attrs = termios.tcgetattr(fd)
+            speed = self.BAUD_RATES[self.baudrate]
+            attrs[4] = attrs[5] = speed
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        except (termios.error, KeyError):
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _discard_input(self):
+        # Drop late replies from a previous timed-out command
+        self._buffer = b''
+        try:
+            while os.read(self._fd, 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    async def _read_line(self) -> str:
+        loop = asyncio.get_running_loop()
+        while b'\r' not in self._buffer and b'\n' not in self._buffer:
+            ready = loop.create_future()
+            loop.add_reader(self._fd, lambda: ready.done() or ready.set_result(None))
+            try:
+                await ready
+            finally:
+                loop.remove_reader(self._fd)
+            try:
+                chunk = os.read(self._fd, 256)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                raise IOError(f"{self.port} closed")
+            self._buffer += chunk
+
+        line, _, self._buffer = self._buffer.replace(b'\n', b'\r').partition(b'\r')
+        return line.decode('ascii', errors='replace').strip()
+
+    async def _read(self) -> float:
+        if self._fd is None:
+            self._open()
+        try:
+            self._discard_input()
+            os.write(self._fd, self.command.encode('ascii') + b'\r')
+            return await self._read_reply()
+        except OSError:
+            # Reopen on the next read in case the device was unplugged
+            self.close()
+            raise
+
+    async def _read_reply(self) -> float:
+        while True:
+            line = await self._read_line()
+            if not line:
+                continue
+            if line.startswith('*ER'):
+                raise IOError(f"{self.sensor_type} probe rejected '{self.command}'")
+            if line.startswith('*'):
+                continue
+            return float(line.split(',')[0])
+
+    def close(self):
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            os.close(fd)
+
@@ -0,0 +1,284 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.database import COLUMN_SENSORS, local_epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+class LiveFeed:
+    """Fans the latest reading, alerts and recent history out to many viewers.
+
+    One producer calls publish() per reading, normally the thread started by
+    run_producer(), so the feed keeps going with no dashboard open and
+    publishes once per interval however many are. Each change is encoded once as
+    a Server-Sent Event holding only what changed since the previous event,
+    and written unchanged to every subscriber that is up to date. New or
+    lagging subscribers get a full snapshot, also encoded once per version.
+    History is kept as per-bucket means in memory, so viewers never touch
+    the database.
+    """
+
+    def __init__(self, history_hours: float = 12, bucket_seconds: int = 60):
+        self.history_seconds = history_hours * 3600
+        self.bucket_seconds = bucket_seconds
+        self.seeded = False
+        self._cond = threading.Condition()
+        self._version = 0
+        self._reading: Dict[str, float] = {}
+        self._alerts: List[Dict] = []
+        self._timestamp: Optional[float] = None
+        self._first_published: Optional[float] = None
+        # bucket start -> {'sums': {sensor: total}, 'counts': {sensor: n}}
+        self._buckets: 'OrderedDict[int, Dict]' = OrderedDict()
+        self._delta_event: Optional[bytes] = b''
+        self._snapshot_event: Optional[bytes] = None
+
+    def _bucket_point(self, start: int) -> Dict:
+        bucket = self._buckets[start]
+        point = {'t': start}
+        for sensor, total in bucket['sums'].items():
+            point[sensor] = round(total / bucket['counts'][sensor], 3)
+        return point
+
+    def _add_to_bucket(self, start: int, sensor: str, total: float, count: int):
+        bucket = self._buckets.setdefault(start, {'sums': {}, 'counts': {}})
+        bucket['sums'][sensor] = bucket['sums'].get(sensor, 0.0) + total
+        bucket['counts'][sensor] = bucket['counts'].get(sensor, 0) + count
+
+    def _drop_old_buckets(self, now: float) -> int:
+        dropped = 0
+        while self._buckets and next(iter(self._buckets)) < now - self.history_seconds:
+            self._buckets.popitem(last=False)
+            dropped += 1
+        return dropped
+
+    def seed_history(self, columns: Dict[str, np.ndarray]):
+        """Fill history from get_historical_data() output, once per process.
+
+        Stored readings from after the first publish are already in the
+        buckets and are skipped.
+        """
+        timestamps = local_epoch_seconds(columns['timestamp'])
+        with self._cond:
+            if self.seeded:
+                return
+            self.seeded = True
+            keep = timestamps < (self._first_published or np.inf)
+            if keep.any():
+                starts, index = np.unique(timestamps[keep] // self.bucket_seconds * self.bucket_seconds,
+                                          return_inverse=True)
+                for column, sensor in COLUMN_SENSORS.items():
+                    values = np.asarray(columns[column], dtype=float)[keep]
+                    valid = ~np.isnan(values)
+                    totals = np.bincount(index[valid], weights=values[valid], minlength=len(starts))
+                    counts = np.bincount(index[valid], minlength=len(starts))
+                    for start, total, count in zip(starts, totals, counts):
+                        if count:
+                            self._add_to_bucket(int(start), sensor, float(total), int(count))
+                self._buckets = OrderedDict(sorted(self._buckets.items()))
+                self._drop_old_buckets(time.time())
+                # Subscribers pick the seeded history up from a new snapshot
+                self._version += 1
+                self._delta_event = None
+                self._snapshot_event = None
+                self._cond.notify_all()
+
+    def publish(self, reading: Dict[str, float], alerts: List[Dict], timestamp: Optional[float] = None):
+        """Record a new reading and wake every subscriber."""
+        now = time.time() if timestamp is None else timestamp
+        reading = {sensor: round(float(value), 3) for sensor, value in reading.items()
+                   if value is not None and not np.isnan(value)}
+        alerts = [{'sensor': a['sensor'], 'message': a['message'], 'severity': a['severity']}
+                  for a in alerts]
+
+        with self._cond:
+            start = int(now // self.bucket_seconds * self.bucket_seconds)
+            for sensor, value in reading.items():
+                self._add_to_bucket(start, sensor, value, 1)
+            dropped = self._drop_old_buckets(now)
+
+            delta = {'timestamp': now, 'history_upsert': [self._bucket_point(start)]}
+            changed = {s: v for s, v in reading.items() if self._reading.get(s) != v}
+            if changed:
+                delta['reading'] = changed
+            if alerts != self._alerts:
+                delta['alerts'] = alerts
+            if dropped:
+                delta['history_drop'] = dropped
+
+            self._reading.update(reading)
+            self._alerts = alerts
+            self._timestamp = now
+            if self._first_published is None:
+                self._first_published = now
+            self._version += 1
+            self._delta_event = self._encode('delta', delta)
+            self._snapshot_event = None
+            self._cond.notify_all()
+
+    def run_producer(self, produce: Callable[[], Optional[Tuple[Dict[str, float], List[Dict]]]],
+                     interval: float = 1.0, seed: Optional[Callable[[], Dict]] = None,
+                     seed_retry: float = 60.0) -> threading.Thread:
+        """Publish produce() every `interval` seconds on a background thread.
+
+        produce() returns (reading, alerts), or None to skip a tick. History
+        is seeded from seed() first, retried every `seed_retry` seconds
+        until it succeeds.
+        """
+        def run():
+            next_seed = 0.0
+            while True:
+                started = time.time()
+                if seed is not None and not self.seeded and started >= next_seed:
+                    try:
+                        self.seed_history(seed())
+                    except Exception as e:
+                        logger.warning("Live feed history not seeded: %s", e)
+                        next_seed = started + seed_retry
+                try:
+                    produced = produce()
+                    if produced is not None:
+                        self.publish(*produced, timestamp=started)
+                except Exception as e:
+                    logger.warning("Live feed producer failed: %s", e)
+                time.sleep(max(0.0, interval - (time.time() - started)))
+
+        thread = threading.Thread(target=run, name='live-feed-producer', daemon=True)
+        thread.start()
+        return thread
+
+    def _encode(self, event: str, data: Dict) -> bytes:
+        payload = json.dumps(data, separators=(',', ':'))
+        return f"id: {self._version}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return self._snapshot_locked()
+
+    def _snapshot_locked(self) -> Dict:
+        return {
+            'timestamp': self._timestamp,
+            'reading': dict(self._reading),
+            'alerts': list(self._alerts),
+            'history': [self._bucket_point(start) for start in self._buckets],
+        }
+
+    def _snapshot_event_locked(self) -> bytes:
+        if self._snapshot_event is None:
+            self._snapshot_event = self._encode('snapshot', self._snapshot_locked())
+        return self._snapshot_event
+
+    def events(self, last_seen: Optional[int] = None, keep_alive: float = 15.0) -> Iterator[bytes]:
+        """Yield encoded events for one subscriber, blocking between changes."""
+        seen = last_seen
+        while True:
+            with self._cond:
+                if self._version == seen:
+                    self._cond.wait(keep_alive)
+                if self._version == seen:
+                    payload = b': keep-alive\n\n'
+                elif seen is not None and self._version == seen + 1 and self._delta_event:
+                    payload = self._delta_event
+                else:
+                    payload = self._snapshot_event_locked()
+                seen = self._version
+            yield payload
+
+
+VIEWER_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Hot Tub Monitor (Live)</title>
+<style>body{font-family:sans-serif;margin:2em}td{padding:.2em 1em}.high{color:#c00}.low{color:#b80}</style>
+</head><body>
+<h1>🌊 Hot Tub Monitor</h1><p id="updated">Connecting…</p>
+<table id="reading"></table><h2>Alerts</h2><ul id="alerts"></ul>
+<p><small>Trend: one-minute averages over the last 12 hours</small></p>
+<script>
+let state = {reading: {}, alerts: [], history: []};
+function sparkline(key) {
+  const points = state.history.filter(p => p[key] !== undefined);
+  if (points.length < 2) return '';
+  const t0 = points[0].t, span = (points[points.length - 1].t - t0) || 1;
+  const values = points.map(p => p[key]);
+  const low = Math.min(...values), range = (Math.max(...values) - low) || 1;
+  const xy = points.map(p => `${((p.t - t0) / span * 240).toFixed(1)},${(28 - (p[key] - low) / range * 26).toFixed(1)}`);
+  return `<svg width="240" height="30"><polyline fill="none" stroke="#06c" stroke-width="1.5" points="${xy.join(' ')}"/></svg>`;
+}
+function render() {
+  document.getElementById('updated').textContent =
+    state.timestamp ? 'Last update: ' + new Date(state.timestamp * 1000).toLocaleTimeString() : 'Waiting for data';
+  document.getElementById('reading').innerHTML = Object.entries(state.reading)
+    .map(([k, v]) => `<tr><td>${k}</td><td>${v.toFixed(2)}</td><td>${sparkline(k)}</td></tr>`).join('');
+  document.getElementById('alerts').innerHTML = state.alerts.length ? state.alerts
+    .map(a => `<li class="${a.severity}">${a.message}</li>`).join('') : '<li>No active alerts</li>';
+}
+const source = new EventSource('events');
+source.addEventListener('snapshot', e => { state = JSON.parse(e.data); render(); });
+source.addEventListener('delta', e => {
+  const d = JSON.parse(e.data);
+  state.timestamp = d.timestamp;
+  Object.assign(state.reading, d.reading || {});
+  if (d.alerts) state.alerts = d.alerts;
+  if (d.history_drop) state.history.splice(0, d.history_drop);
+  for (const p of d.history_upsert || []) {
+    const last = state.history[state.history.length - 1];
+    if (last && last.t === p.t) state.history[state.history.length - 1] = p; else state.history.push(p);
+  }
+  render();
+});
+</script></body></html>
+"""
+
+
+class _LiveFeedHandler(BaseHTTPRequestHandler):
+    feed: LiveFeed = None
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/events':
+            self._stream()
+        elif path == '/snapshot':
+            self._send(200, 'application/json', json.dumps(self.feed.snapshot()).encode())
+        elif path == '/':
+            self._send(200, 'text/html; charset=utf-8', VIEWER_PAGE.encode())
+        else:
+            self._send(404, 'text/plain', b'Not found')
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        last_event_id = self.headers.get('Last-Event-ID', '')
+        last_seen = int(last_event_id) if last_event_id.isdigit() else None
+        try:
+            for payload in self.feed.events(last_seen):
+                self.wfile.write(payload)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        logger.debug("live feed: " + format, *args)
+
+
+def start_live_server(feed: LiveFeed, port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve the feed read-only over HTTP/SSE on a background thread."""
+    handler = type('LiveFeedHandler', (_LiveFeedHandler,), {'feed': feed})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='live-feed', daemon=True).start()
+    return server
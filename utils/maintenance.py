@@ -1,21 +1,22 @@
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Dict, List
-import psycopg2
-import os
 
-class MaintenanceScheduler:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.environ['PGDATABASE'],
-            user=os.environ['PGUSER'],
-            password=os.environ['PGPASSWORD'],
-            host=os.environ['PGHOST'],
-            port=os.environ['PGPORT']
-        )
-        self._create_tables()
+from utils.database import LazySchema, pooled_connection
 
-    def _create_tables(self):
-        with self.conn.cursor() as cur:
+class MaintenanceScheduler(LazySchema):
+    store_name = 'maintenance'
+
+    @contextmanager
+    def get_cursor(self):
+        """Cursor on a pooled connection, committed when the block succeeds."""
+        self.ensure_schema()
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    def _create_tables(self, conn):
+        with conn.cursor() as cur:
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS maintenance_tasks (
                     id SERIAL PRIMARY KEY,
@@ -34,26 +35,25 @@ class MaintenanceScheduler:
                     notes TEXT
                 );
             """)
-            self.conn.commit()
+            conn.commit()
 
     def add_task(self, task_name: str, description: str, frequency_days: int):
-        with self.conn.cursor() as cur:
+        with self.get_cursor() as cur:
             next_due = datetime.now() + timedelta(days=frequency_days)
             cur.execute("""
                 INSERT INTO maintenance_tasks 
                 (task_name, description, frequency_days, next_due)
                 VALUES (%s, %s, %s, %s)
             """, (task_name, description, frequency_days, next_due))
-            self.conn.commit()
 
     def get_upcoming_tasks(self, days_ahead: int = 7) -> List[Dict]:
-        with self.conn.cursor() as cur:
+        with self.get_cursor() as cur:
             cur.execute("""
                 SELECT id, task_name, description, frequency_days, last_completed, next_due
                 FROM maintenance_tasks
-                WHERE next_due <= NOW() + INTERVAL '%s days'
+                WHERE next_due <= %s
                 ORDER BY next_due ASC
-            """, (days_ahead,))
+            """, (datetime.now() + timedelta(days=days_ahead),))
             
             tasks = []
             for row in cur.fetchall():
@@ -68,29 +68,28 @@ class MaintenanceScheduler:
             return tasks
 
     def complete_task(self, task_id: int, notes: str = ""):
-        with self.conn.cursor() as cur:
+        with self.get_cursor() as cur:
             # Get the task's frequency
             cur.execute("SELECT frequency_days FROM maintenance_tasks WHERE id = %s", (task_id,))
             frequency_days = cur.fetchone()[0]
 
             # Update the task
-            next_due = datetime.now() + timedelta(days=frequency_days)
+            completed_at = datetime.now()
+            next_due = completed_at + timedelta(days=frequency_days)
             cur.execute("""
                 UPDATE maintenance_tasks 
-                SET last_completed = CURRENT_TIMESTAMP, next_due = %s
+                SET last_completed = %s, next_due = %s
                 WHERE id = %s
-            """, (next_due, task_id))
+            """, (completed_at, next_due, task_id))
 
             # Log in history
             cur.execute("""
-                INSERT INTO maintenance_history (task_id, notes)
-                VALUES (%s, %s)
-            """, (task_id, notes))
-            
-            self.conn.commit()
+                INSERT INTO maintenance_history (task_id, completed_at, notes)
+                VALUES (%s, %s, %s)
+            """, (task_id, completed_at, notes))
 
     def get_task_history(self, task_id: int) -> List[Dict]:
-        with self.conn.cursor() as cur:
+        with self.get_cursor() as cur:
             cur.execute("""
                 SELECT completed_at, notes
                 FROM maintenance_history
@@ -106,6 +105,31 @@ class MaintenanceScheduler:
                 })
             return history
 
+    def get_recent_task_history(self, task_ids: List[int], per_task: int = 10) -> Dict[int, List[Dict]]:
+        """The latest `per_task` completions of each given task in one query, keyed by task id."""
+        if not task_ids:
+            return {}
+        with self.get_cursor() as cur:
+            cur.execute("""
+                SELECT task_id, completed_at, notes
+                FROM (
+                    SELECT task_id, completed_at, notes,
+                           ROW_NUMBER() OVER (PARTITION BY task_id ORDER BY completed_at DESC) AS recent
+                    FROM maintenance_history
+                    WHERE task_id = ANY(%s)
+                ) AS history
+                WHERE recent <= %s
+                ORDER BY completed_at DESC
+            """, (list(task_ids), per_task))
+
+            history = {}
+            for row in cur.fetchall():
+                history.setdefault(row[0], []).append({
+                    'completed_at': row[1],
+                    'notes': row[2]
+                })
+            return history
+
     def get_default_tasks(self) -> List[Dict]:
         return [
             {
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from utils.drivers import SensorDriver, SerialProbe, SimulatedProbe
+from utils.sensors import SENSOR_TYPES, SIMULATED_RANGES
+
+class AsyncSensorPoller:
+    """Reads every probe concurrently on a dedicated asyncio loop.
+
+    Each probe gets `timeout` seconds per attempt, or its own entry in
+    `timeouts`, and `retries` extra attempts. A probe that fails keeps its last good value, marked stale,
+    as does one whose last good value is older than its sampling interval
+    (from `intervals`, if given) plus `stale_after` seconds.
+    """
+
+    def __init__(self, drivers: List[SensorDriver], timeout: float = 0.4,
+                 retries: int = 1, stale_after: float = 10.0,
+                 intervals: Optional[Dict[str, float]] = None,
+                 timeouts: Optional[Dict[str, float]] = None):
+        self.drivers = {driver.sensor_type: driver for driver in drivers}
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.retries = retries
+        self.stale_after = stale_after
+        self.intervals = intervals or {}
+        self._last: Dict[str, Dict] = {
+            sensor: {'value': None, 'timestamp': None, 'stale': True, 'error': None}
+            for sensor in self.drivers
+        }
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='sensor-poller', daemon=True).start()
+
+    async def _poll_probe(self, driver: SensorDriver):
+        error = None
+        timeout = self.timeouts.get(driver.sensor_type, self.timeout)
+        for attempt in range(self.retries + 1):
+            try:
+                value = await asyncio.wait_for(driver.read(), timeout)
+            except asyncio.TimeoutError:
+                error = f"no reply within {timeout:.2f}s"
+            except (OSError, ValueError) as e:
+                error = str(e)
+            else:
+                self._last[driver.sensor_type] = {
+                    'value': value, 'timestamp': time.time(), 'stale': False, 'error': None
+                }
+                return
+        self._last[driver.sensor_type] = dict(self._last[driver.sensor_type], stale=True, error=error)
+
+    async def poll_once(self, sensors: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Poll the given sensors (all by default) concurrently."""
+        wanted = self.drivers if sensors is None else [s for s in sensors if s in self.drivers]
+        await asyncio.gather(*(self._poll_probe(self.drivers[sensor]) for sensor in wanted))
+
+        now = time.time()
+        for sensor, reading in self._last.items():
+            max_age = self.intervals.get(sensor, 0.0) + self.stale_after
+            if reading['timestamp'] is None or now - reading['timestamp'] > max_age:
+                reading['stale'] = True
+        return {sensor: dict(reading) for sensor, reading in self._last.items()}
+
+    def poll(self, sensors: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Synchronous wrapper around poll_once for the Streamlit script thread."""
+        future = asyncio.run_coroutine_threadsafe(self.poll_once(sensors), self._loop)
+        return future.result()
+
+    def get_raw_readings(self, sensors: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Poll probes (all by default) and return fresh values in the SensorSimulator format.
+
+        Stale probes are left out rather than repeating an old value.
+        """
+        sensors = None if sensors is None else list(sensors)
+        readings = self.poll(sensors)
+        return {sensor: readings[sensor]['value'] for sensor in (readings if sensors is None else sensors)
+                if sensor in readings and not readings[sensor]['stale']}
+
+    def stale_sensors(self) -> List[str]:
+        return [sensor for sensor, reading in self._last.items() if reading['stale']]
+
+    def close(self):
+        for driver in self.drivers.values():
+            driver.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def load_poller(config_path: str, intervals: Optional[Dict[str, float]] = None) -> AsyncSensorPoller:
+    """Build a poller from a JSON probe configuration file.
+
+    Example:
+        {"timeout": 0.4, "retries": 1, "stale_after": 10,
+         "probes": {"ph": {"port": "/dev/ttyUSB0", "command": "R", "baudrate": 9600,
+                           "timeout": 1.0}}}
+
+    A probe's own "timeout" overrides the global one. Sensors without a
+    probe entry are served by simulated probes.
+    `intervals` are the sensors' sampling intervals, which staleness allows for.
+    """
+    with open(config_path) as f:
+        config = json.load(f)
+
+    probes = config.get('probes', {})
+    drivers = []
+    for sensor in SENSOR_TYPES:
+        probe = probes.get(sensor)
+        if probe and 'port' in probe:
+            drivers.append(SerialProbe(sensor, probe['port'], probe.get('command', 'R'),
+                                       probe.get('baudrate', 9600)))
+        else:
+            low, high = SIMULATED_RANGES[sensor]
+            drivers.append(SimulatedProbe(sensor, low, high, (probe or {}).get('latency', 0.05)))
+
+    return AsyncSensorPoller(
+        drivers,
+        timeout=config.get('timeout', 0.4),
+        retries=config.get('retries', 1),
+        stale_after=config.get('stale_after', 10.0),
+        intervals=intervals,
+        timeouts={sensor: probe['timeout'] for sensor, probe in probes.items() if 'timeout' in probe}
+    )
@@ -0,0 +1,291 @@
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Where time is attributed, by file path fragment. A sample is charged to the
+# innermost frame that matches, so NumPy work done for pandas counts as
+# DataFrame building and JSON encoding done by plotly as plotly.
+CATEGORIES = [
+    ('database', ('/psycopg2/', '/utils/database.py', '/utils/maintenance.py')),
+    ('dataframes', ('/pandas/',)),
+    ('plotly', ('/plotly/', '/_plotly_utils/')),
+    ('widgets', ('/streamlit/',)),
+]
+
+
+def categorize(filename: str) -> Optional[str]:
+    path = filename.replace(os.sep, '/')
+    for category, fragments in CATEGORIES:
+        if any(fragment in path for fragment in fragments):
+            return category
+    return None
+
+
+def _profile_category(stats: Dict, func: Tuple) -> str:
+    """Category of a pstats entry's own time.
+
+    Built-ins such as cursor.execute have no file, so they are charged to
+    their main caller's category, and lock waits to 'waiting': the time is
+    counted where the awaited thread spends it.
+    """
+    filename = func[0]
+    callers = stats[func][4]
+    if filename == '~' and callers:
+        filename = max(callers, key=lambda caller: callers[caller][3])[0]
+        if _waiting(filename):
+            return 'waiting'
+    return categorize(filename) or 'app'
+
+
+def _waiting(filename: str) -> bool:
+    """Whether a thread stopped in this file is blocked on another thread."""
+    path = filename.replace(os.sep, '/')
+    return path.endswith('/threading.py') or path.endswith('/concurrent/futures/_base.py')
+
+
+def _stack(frame, root) -> List:
+    """Code objects from the outermost frame (root, or the thread's first) inwards."""
+    stack = []
+    while frame is not None:
+        stack.append(frame.f_code)
+        if frame is root:
+            break
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def _frame_name(code) -> str:
+    """Function name with a short location, in a form flamegraph tools accept."""
+    parts = code.co_filename.replace(os.sep, '/').split('/')
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})".replace(';', ',')
+
+
+class _StackSampler:
+    """Samples one thread's stack on a timer, counting identical stacks.
+
+    While that thread is blocked waiting on helper work (see
+    RerunProfiler.run_helper), the sample is charged to a busy helper's
+    stack instead, grafted below the wait.
+    """
+
+    def __init__(self, thread_id: int, root, interval: float, counts: Counter, helpers: Dict):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.counts = counts
+        self.helpers = helpers
+        self._turn = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rerun-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            # Walk up to the frame that started the capture, leaving out
+            # Streamlit's script runner and the profiler itself
+            stack = _stack(frames.get(self.thread_id), self.root)
+            if stack and _waiting(stack[-1].co_filename):
+                busy = [(frames[ident], root) for ident, root in list(self.helpers.items()) if ident in frames]
+                if busy:
+                    # Round-robin, so concurrent helpers share the waiting time
+                    self._turn += 1
+                    frame, root = busy[self._turn % len(busy)]
+                    stack += _stack(frame, root)
+            # A sample taken while stopping would show the profiler's own join
+            if stack and not self._stop.is_set():
+                self.counts[tuple(stack)] += 1
+
+
+class RerunProfiler:
+    """Captures a profile of the next N dashboard reruns on request.
+
+    Nothing is profiled until an operator arms a capture; until then
+    capture() only checks a counter. In 'sampling' mode a helper thread
+    records the rerun thread's stack every `interval` seconds and the result
+    is saved as folded stacks (flamegraph.pl, speedscope). In 'deterministic'
+    mode cProfile traces every call and the result is saved as a pstats file
+    (snakeviz, flameprof). One capture runs at a time across all sessions.
+
+    Work that reruns hand to other threads, such as AsyncStorage's queries,
+    is covered by running it through run_helper().
+    """
+
+    def __init__(self, output_dir: str = 'profiles', interval: float = 0.005, top: int = 15):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top = top
+        self.last_report: Optional[Dict] = None
+        self._remaining = 0
+        self._mode = 'sampling'
+        self._busy = False
+        self._stacks: Counter = Counter()
+        self._profile: Optional[cProfile.Profile] = None
+        self._helper_profiles: List[cProfile.Profile] = []
+        # thread id -> frame of each run_helper call in progress
+        self._helpers: Dict[int, object] = {}
+        self._reruns = 0
+        self._wall = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    def arm(self, reruns: int, mode: str = 'sampling'):
+        """Profile the next `reruns` reruns."""
+        if mode not in ('sampling', 'deterministic'):
+            raise ValueError(f"Unknown profiling mode '{mode}'")
+        with self._lock:
+            if self._busy:
+                raise ValueError("A capture is already running")
+            self._mode = mode
+            self._remaining = reruns
+            self._stacks = Counter()
+            self._profile = cProfile.Profile() if mode == 'deterministic' else None
+            self._helper_profiles = []
+            self._reruns = 0
+            self._wall = 0.0
+
+    @contextmanager
+    def capture(self):
+        """Profile the enclosed rerun if a capture is armed."""
+        if not self._remaining:
+            yield
+            return
+        with self._lock:
+            if self._busy or not self._remaining:
+                take = False
+            else:
+                take = self._busy = True
+        if not take:
+            yield
+            return
+
+        sampler = None
+        if self._profile is None:
+            sampler = _StackSampler(threading.get_ident(), sys._getframe(2), self.interval, self._stacks,
+                                    self._helpers)
+            sampler.start()
+        else:
+            self._profile.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if sampler:
+                sampler.stop()
+            else:
+                self._profile.disable()
+            with self._lock:
+                self._wall += elapsed
+                self._reruns += 1
+                self._remaining -= 1
+                self._busy = False
+                finished = not self._remaining
+            if finished:
+                self._finish()
+
+    def run_helper(self, func, *args):
+        """Call func(*args) on a helper thread, covered by a running capture.
+
+        Profilers only see the thread they run on, so helper threads are
+        tracked here: in sampling mode the rerun's waits are charged to the
+        helper's stack, in deterministic mode the call gets its own cProfile
+        profile, merged into the capture's.
+        """
+        if not self._busy:
+            return func(*args)
+        if self._profile is None:
+            ident = threading.get_ident()
+            self._helpers[ident] = sys._getframe()
+            try:
+                return func(*args)
+            finally:
+                self._helpers.pop(ident, None)
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._helper_profiles = self._helper_profiles + [profile]
+
+    def _finish(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        if self._profile is None:
+            path = os.path.join(self.output_dir, f"rerun-{stamp}.folded")
+            with open(path, 'w') as f:
+                for stack, count in self._stacks.items():
+                    f.write(f"{';'.join(_frame_name(code) for code in stack)} {count}\n")
+            categories, hot_spots = self._summarize_samples()
+        else:
+            path = os.path.join(self.output_dir, f"rerun-{stamp}.prof")
+            pstats.Stats(self._profile, *self._helper_profiles).dump_stats(path)
+            categories, hot_spots = self._summarize_profile()
+
+        self.last_report = {
+            'mode': self._mode,
+            'reruns': self._reruns,
+            'wall_ms': self._wall * 1000,
+            'path': path,
+            'categories': categories,
+            'hot_spots': hot_spots,
+        }
+        logger.info("Profiled %d reruns (%.0f ms) to %s", self._reruns, self._wall * 1000, path)
+
+    def _summarize_samples(self) -> Tuple[Dict[str, float], List[Dict]]:
+        ms_per_sample = self._wall * 1000 / max(sum(self._stacks.values()), 1)
+        categories: Counter = Counter()
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self._stacks.items():
+            category = next((c for c in map(categorize, (code.co_filename for code in reversed(stack))) if c),
+                            'app')
+            categories[category] += count
+            own[stack[-1]] += count
+            for code in set(stack):
+                total[code] += count
+
+        hot_spots = [
+            {'function': _frame_name(code), 'category': categorize(code.co_filename) or 'app',
+             'self_ms': count * ms_per_sample, 'total_ms': total[code] * ms_per_sample}
+            for code, count in own.most_common(self.top)
+        ]
+        return {c: n * ms_per_sample for c, n in categories.most_common()}, hot_spots
+
+    def _summarize_profile(self) -> Tuple[Dict[str, float], List[Dict]]:
+        # Includes helper threads, so categories add up to thread time
+        stats = pstats.Stats(self._profile, *self._helper_profiles).stats
+        categories: Counter = Counter()
+        for func, (_, _, own_s, _, _) in stats.items():
+            categories[_profile_category(stats, func)] += own_s * 1000
+
+        top = sorted(stats.items(), key=lambda item: -item[1][2])[:self.top]
+        hot_spots = [
+            {'function': f"{name} ({'/'.join(filename.replace(os.sep, '/').split('/')[-2:])}:{line})",
+             'category': _profile_category(stats, (filename, line, name)),
+             'self_ms': own_s * 1000, 'total_ms': cumulative_s * 1000}
+            for (filename, line, name), (_, _, own_s, cumulative_s, _) in top
+        ]
+        return dict(categories.most_common()), hot_spots
@@ -1,4 +1,6 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
+
+import numpy as np
 
 class WaterQualityRecommender:
     def __init__(self):
@@ -15,110 +17,111 @@ class WaterQualityRecommender:
             'uv_intensity': {'min': 20.0, 'max': 35.0, 'unit': 'mW/cm²'}
         }
 
-    def get_recommendations(self, readings: Dict[str, float]) -> List[Dict[str, str]]:
-        recommendations = []
-
-        # Previous recommendations code...
-        if readings['ph'] < self.optimal_ranges['ph']['min']:
-            recommendations.append({
+        # Advice per (sensor, status), in the order recommendations are listed
+        self.advice = {
+            ('ph', 'low'): {
                 'parameter': 'pH',
-                'status': 'low',
                 'action': 'Add pH increaser (sodium carbonate). Test after 4 hours.',
                 'details': 'Low pH can cause eye irritation and corrode equipment.'
-            })
-        elif readings['ph'] > self.optimal_ranges['ph']['max']:
-            recommendations.append({
+            },
+            ('ph', 'high'): {
                 'parameter': 'pH',
-                'status': 'high',
                 'action': 'Add pH decreaser (sodium bisulfate). Test after 4 hours.',
                 'details': 'High pH reduces sanitizer effectiveness and can cause scaling.'
-            })
-
-        if readings['temperature'] < self.optimal_ranges['temperature']['min']:
-            recommendations.append({
+            },
+            ('temperature', 'low'): {
                 'parameter': 'Temperature',
-                'status': 'low',
                 'action': 'Increase heater temperature setting.',
                 'details': 'Low temperature can make bathing uncomfortable and affect sanitizer effectiveness.'
-            })
-        elif readings['temperature'] > self.optimal_ranges['temperature']['max']:
-            recommendations.append({
+            },
+            ('temperature', 'high'): {
                 'parameter': 'Temperature',
-                'status': 'high',
                 'action': 'Reduce heater temperature setting or use cooling mode if available.',
                 'details': 'High temperature increases chemical consumption and can be uncomfortable.'
-            })
-
-        if readings['turbidity'] > self.optimal_ranges['turbidity']['max']:
-            recommendations.append({
+            },
+            ('turbidity', 'high'): {
                 'parameter': 'Turbidity',
-                'status': 'high',
                 'action': 'Clean or replace filter. Add water clarifier if needed.',
                 'details': 'High turbidity indicates presence of suspended particles and possible contamination.'
-            })
-
-        if readings['orp'] < self.optimal_ranges['orp']['min']:
-            recommendations.append({
+            },
+            ('orp', 'low'): {
                 'parameter': 'ORP',
-                'status': 'low',
                 'action': 'Add sanitizer (chlorine/bromine). Check for organic contamination.',
                 'details': 'Low ORP indicates insufficient sanitizer levels for proper disinfection.'
-            })
-        elif readings['orp'] > self.optimal_ranges['orp']['max']:
-            recommendations.append({
+            },
+            ('orp', 'high'): {
                 'parameter': 'ORP',
-                'status': 'high',
                 'action': 'Reduce sanitizer addition. Wait for levels to decrease naturally.',
                 'details': 'High ORP may cause skin/eye irritation and equipment damage.'
-            })
-
-        if readings['conductivity'] < self.optimal_ranges['conductivity']['min']:
-            recommendations.append({
+            },
+            ('conductivity', 'low'): {
                 'parameter': 'Conductivity/TDS',
-                'status': 'low',
                 'action': 'Add mineral balancer to increase TDS levels.',
                 'details': 'Low TDS levels may result in poor water conditioning and reduced therapeutic benefits.'
-            })
-        elif readings['conductivity'] > self.optimal_ranges['conductivity']['max']:
-            recommendations.append({
+            },
+            ('conductivity', 'high'): {
                 'parameter': 'Conductivity/TDS',
-                'status': 'high',
                 'action': 'Partially drain and refill with fresh water to reduce TDS levels.',
                 'details': 'High TDS levels can cause equipment corrosion and reduce sanitizer effectiveness.'
-            })
-
-        # Add bromine-specific recommendations
-        if readings['bromine'] < self.optimal_ranges['bromine']['min']:
-            recommendations.append({
+            },
+            # Bromine-specific recommendations
+            ('bromine', 'low'): {
                 'parameter': 'Bromine',
-                'status': 'low',
                 'action': 'Add sodium bromide and activate with oxidizer. Test after 2 hours.',
                 'details': 'Low bromine levels reduce sanitizing effectiveness and can lead to bacterial growth.'
-            })
-        elif readings['bromine'] > self.optimal_ranges['bromine']['max']:
-            recommendations.append({
+            },
+            ('bromine', 'high'): {
                 'parameter': 'Bromine',
-                'status': 'high',
                 'action': 'Stop adding bromine and allow levels to naturally decrease. Consider partial water change.',
                 'details': 'High bromine levels can cause skin and eye irritation.'
-            })
-
-        # Add UV system recommendations
-        if readings['uv_intensity'] < self.optimal_ranges['uv_intensity']['min']:
-            recommendations.append({
+            },
+            # UV system recommendations
+            ('uv_intensity', 'low'): {
                 'parameter': 'UV System',
-                'status': 'low',
                 'action': 'Clean UV lamp and quartz sleeve. Check lamp age and replace if over 12 months old.',
                 'details': 'Low UV intensity reduces sterilization effectiveness. Could be due to mineral buildup or aging lamp.'
-            })
-        elif readings['uv_intensity'] > self.optimal_ranges['uv_intensity']['max']:
-            recommendations.append({
+            },
+            ('uv_intensity', 'high'): {
                 'parameter': 'UV System',
-                'status': 'high',
                 'action': 'Check UV sensor calibration and verify proper lamp wattage.',
                 'details': 'Unusually high UV readings may indicate sensor calibration issues.'
+            }
+        }
+
+    def parameter_name(self, sensor: str) -> str:
+        """Display name of a sensor's parameter, as used in its advice."""
+        if sensor == 'all':
+            return 'All Parameters'
+        return next((advice['parameter'] for (name, _), advice in self.advice.items() if name == sensor),
+                    sensor.replace('_', ' ').title())
+
+    def get_recommendations(self, readings: Dict[str, float]) -> List[Dict[str, str]]:
+        recommendations = []
+
+        # A sensor without a reading is reported as unknown, never as in range
+        missing = [sensor for sensor in self.optimal_ranges
+                   if readings.get(sensor) is None or np.isnan(readings[sensor])]
+        for sensor in missing:
+            recommendations.append({
+                'parameter': self.parameter_name(sensor),
+                'status': 'unknown',
+                'action': 'Check the probe and its connection.',
+                'details': 'No reading has been received from this sensor.'
             })
 
+        for (sensor, status), advice in self.advice.items():
+            if sensor in missing:
+                continue
+            value = readings[sensor]
+            limits = self.optimal_ranges[sensor]
+            if (status == 'low' and value < limits['min']) or (status == 'high' and value > limits['max']):
+                recommendations.append({
+                    'parameter': advice['parameter'],
+                    'status': status,
+                    'action': advice['action'],
+                    'details': advice['details']
+                })
+
         # If everything is optimal
         if not recommendations:
             recommendations.append({
@@ -129,3 +132,21 @@ class WaterQualityRecommender:
             })
 
         return recommendations
+
+    def classify_arrays(self, columns: Dict[str, np.ndarray]) -> Dict[Tuple[str, str], np.ndarray]:
+        """Vectorized get_recommendations: which samples trigger each piece of advice.
+
+        Returns a boolean array per (sensor, status) key of self.advice, a
+        (sensor, 'unknown') array per sensor for samples with no value (NaN),
+        and ('all', 'optimal') for samples that trigger none of these.
+        """
+        triggered = {}
+        for sensor, status in self.advice:
+            values = np.asarray(columns[sensor], dtype=float)
+            limits = self.optimal_ranges[sensor]
+            # NaN compares False, so a missing value is never low or high
+            triggered[(sensor, status)] = values < limits['min'] if status == 'low' else values > limits['max']
+        for sensor in self.optimal_ranges:
+            triggered[(sensor, 'unknown')] = np.isnan(np.asarray(columns[sensor], dtype=float))
+        triggered[('all', 'optimal')] = ~np.any(list(triggered.values()), axis=0)
+        return triggered
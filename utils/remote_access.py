@@ -5,13 +5,18 @@ from datetime import datetime
 class RemoteAccessManager:
     def __init__(self):
         self.web_port = 5000
+        # Lightweight read-only live feed (Server-Sent Events), see utils.live_feed
+        self.live_port = int(os.environ.get('HUBSOAK_LIVE_PORT', 5001))
+        self.live_external_port = int(os.environ.get('HUBSOAK_LIVE_EXTERNAL_PORT', 3000))
         self._access_logs = []
         
     def get_connection_info(self):
         """Get remote access connection information"""
+        url = f"https://{os.environ.get('REPL_SLUG', 'your-repl')}.{os.environ.get('REPL_OWNER', 'user')}.repl.co"
         return {
             'web_port': self.web_port,
-            'url': f"https://{os.environ.get('REPL_SLUG', 'your-repl')}.{os.environ.get('REPL_OWNER', 'user')}.repl.co",
+            'url': url,
+            'live_url': f"{url}:{self.live_external_port}/",
             'status': 'running'  # Streamlit is always running
         }
     
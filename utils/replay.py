@@ -0,0 +1,200 @@
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from utils import startup
+from utils.database import COLUMN_SENSORS, READING_COLUMNS, Database, forward_fill
+from utils.recommendations import WaterQualityRecommender
+from utils.rules import RuleEngine
+from utils.sensors import SENSOR_TYPES
+
+# A batch is (timestamps, {sensor: calibrated values}), oldest first
+Batch = Tuple[np.ndarray, Dict[str, np.ndarray]]
+
+
+def database_batches(db: Database, start: datetime, end: Optional[datetime] = None,
+                     batch_size: int = 50000) -> Iterator[Batch]:
+    """Stream stored readings, filled step-wise and calibrated as the dashboard shows them."""
+    calibration = db.get_calibration_history()
+    carry = db.get_last_values(start)
+    for rows in db.iter_raw_history(start, end, batch_size):
+        timestamps = np.array([row[0] for row in rows], dtype='datetime64[us]')
+        raw = forward_fill(np.array([row[1:] for row in rows], dtype=float), carry)
+        carry = tuple(raw[-1])
+        yield timestamps, {
+            COLUMN_SENSORS[column]: calibration.apply(COLUMN_SENSORS[column], timestamps, raw[:, i])
+            for i, column in enumerate(READING_COLUMNS)
+        }
+
+
+def file_batches(path: str, batch_size: int = 50000) -> Iterator[Batch]:
+    """Stream a CSV or Parquet export with a timestamp column and one column per sensor.
+
+    Columns may use sensor names or table column names (ph_level, orp_level).
+    Values are taken as already calibrated.
+    """
+    pd = startup.lazy_import('pandas')
+    if path.endswith('.parquet'):
+        frame = pd.read_parquet(path)
+        chunks = (frame.iloc[i:i + batch_size] for i in range(0, len(frame), batch_size))
+    else:
+        chunks = pd.read_csv(path, chunksize=batch_size, parse_dates=['timestamp'])
+
+    carry = None
+    for chunk in chunks:
+        chunk = chunk.rename(columns=COLUMN_SENSORS)
+        timestamps = chunk['timestamp'].to_numpy(dtype='datetime64[us]')
+        raw = forward_fill(chunk[SENSOR_TYPES].to_numpy(dtype=float), carry)
+        carry = tuple(raw[-1])
+        yield timestamps, {sensor: raw[:, i] for i, sensor in enumerate(SENSOR_TYPES)}
+
+
+class VirtualClock:
+    """Stored time replayed at a multiple of real time, or unpaced if speed is None."""
+
+    def __init__(self, speed: Optional[float] = None):
+        self.speed = speed
+        self.now: Optional[float] = None
+        self._origin: Optional[Tuple[float, float]] = None
+
+    def advance(self, virtual_time: float):
+        """Move to a virtual time, sleeping first if running ahead of the set speed."""
+        if self._origin is None:
+            self._origin = (virtual_time, time.perf_counter())
+        if self.speed:
+            due = self._origin[1] + (virtual_time - self._origin[0]) / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.now = virtual_time
+
+
+class ReplayEngine:
+    """Runs stored readings through the alert rules and recommendations.
+
+    Each batch goes through RuleEngine.evaluate_arrays and
+    WaterQualityRecommender.classify_arrays, so a month of history costs a
+    few vectorized passes. Alert episodes and breach state carry across
+    batches, and the virtual clock paces batches when a speed is set.
+    """
+
+    def __init__(self, rule_engine: Optional[RuleEngine] = None,
+                 recommender: Optional[WaterQualityRecommender] = None,
+                 speed: Optional[float] = None):
+        self.rule_engine = rule_engine or RuleEngine()
+        self.recommender = recommender or WaterQualityRecommender()
+        self.clock = VirtualClock(speed)
+
+    def run(self, batches: Iterable[Batch]) -> Dict:
+        rules = self.rule_engine.rules
+        state = self.rule_engine.new_state()
+        open_since = np.full(len(rules), np.nan)
+        episodes = {rule['name']: {'count': 0, 'total_s': 0.0, 'longest_s': 0.0} for rule in rules}
+        advice_seconds: Dict[Tuple[str, str], float] = {}
+        advice_samples: Dict[Tuple[str, str], int] = {}
+        previous: Optional[Tuple[float, Dict]] = None
+        first_time = last_time = None
+        first_stamp = last_stamp = None
+        samples = 0
+        started = time.perf_counter()
+
+        for timestamps, columns in batches:
+            if not len(timestamps):
+                continue
+            timestamps = timestamps.astype('datetime64[us]')
+            seconds = timestamps.astype('int64') / 1e6
+            self.clock.advance(seconds[-1])
+            first_time = seconds[0] if first_time is None else first_time
+            last_time = seconds[-1]
+            # Reported as stored; the seconds count wall-clock fields as if UTC
+            first_stamp = timestamps[0] if first_stamp is None else first_stamp
+            last_stamp = timestamps[-1]
+            samples += len(seconds)
+
+            # Alert episodes: runs of active samples, ended by the first inactive one
+            active = self.rule_engine.evaluate_arrays(columns, seconds, state)['active']
+            for i, rule in enumerate(rules):
+                was_open = not np.isnan(open_since[i])
+                before = np.concatenate(([was_open], active[i, :-1]))
+                starts = seconds[active[i] & ~before]
+                ends = seconds[~active[i] & before]
+                if was_open:
+                    starts = np.concatenate(([open_since[i]], starts))
+                durations = ends - starts[:len(ends)]
+                open_since[i] = starts[len(ends)] if len(starts) > len(ends) else np.nan
+                tally = episodes[rule['name']]
+                tally['count'] += len(durations)
+                tally['total_s'] += float(durations.sum())
+                tally['longest_s'] = max(tally['longest_s'], float(durations.max(initial=0.0)))
+
+            # Recommendations, weighted by how long each sample held
+            triggered = self.recommender.classify_arrays(columns)
+            held = np.diff(seconds, append=seconds[-1])
+            if previous is not None:
+                gap = seconds[0] - previous[0]
+                for key, was_triggered in previous[1].items():
+                    if was_triggered:
+                        advice_seconds[key] += gap
+            for key, mask in triggered.items():
+                advice_seconds[key] = advice_seconds.get(key, 0.0) + float(held[mask].sum())
+                advice_samples[key] = advice_samples.get(key, 0) + int(mask.sum())
+            previous = (seconds[-1], {key: bool(mask[-1]) for key, mask in triggered.items()})
+
+        # Episodes still open at the end of the data count up to the last sample
+        for i, rule in enumerate(rules):
+            if not np.isnan(open_since[i]):
+                tally = episodes[rule['name']]
+                tally['count'] += 1
+                tally['total_s'] += last_time - open_since[i]
+                tally['longest_s'] = max(tally['longest_s'], last_time - open_since[i])
+                tally['ongoing'] = True
+
+        wall = time.perf_counter() - started
+        span = (last_time - first_time) if samples else 0.0
+        return {
+            'samples': samples,
+            'start': first_stamp.item().isoformat() if samples else None,
+            'end': last_stamp.item().isoformat() if samples else None,
+            'replayed_seconds': span,
+            'wall_seconds': wall,
+            'speedup': span / wall if wall else None,
+            'alerts': {
+                rule['name']: dict(episodes[rule['name']], label=rule['label'])
+                for rule in rules if episodes[rule['name']]['count']
+            },
+            'recommendations': {
+                f"{key[0]}:{key[1]}": {
+                    'parameter': self.recommender.parameter_name(key[0]),
+                    'status': key[1],
+                    'samples': advice_samples[key],
+                    'hours': advice_seconds[key] / 3600,
+                    'share': advice_seconds[key] / span if span else 0.0,
+                }
+                for key in advice_samples
+            },
+        }
+
+
+def format_report(report: Dict) -> str:
+    """Render a replay report as plain text."""
+    lines = [
+        f"Replayed {report['samples']:,} samples from {report['start']} to {report['end']}",
+        f"{report['replayed_seconds'] / 86400:.1f} days in {report['wall_seconds']:.2f} s"
+        + (f" ({report['speedup']:,.0f}x real time)" if report['speedup'] else ''),
+        '',
+        'Alerts:',
+    ]
+    if not report['alerts']:
+        lines.append('  none')
+    for name, alert in sorted(report['alerts'].items(), key=lambda item: -item[1]['total_s']):
+        lines.append(f"  {alert['label']} ({name}): {alert['count']} episodes, "
+                     f"{alert['total_s'] / 3600:.1f} h total, longest {alert['longest_s'] / 60:.0f} min"
+                     + (' (ongoing)' if alert.get('ongoing') else ''))
+    lines += ['', 'Recommendations:']
+    for rec in sorted(report['recommendations'].values(), key=lambda r: -r['hours']):
+        if rec['samples']:
+            lines.append(f"  {rec['parameter']} {rec['status']}: {rec['hours']:.1f} h "
+                         f"({rec['share']:.0%}), {rec['samples']:,} samples")
+    return '\n'.join(lines)
@@ -0,0 +1,218 @@
+import ast
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.sensor_types import SENSOR_TYPES
+
+# Rules are plain dicts:
+#   name         unique key, used as the alert key
+#   expr         expression over sensor names, e.g. 'total_chlorine - free_chlorine'
+#   min / max    bounds; either may be left out
+#   label, unit  used in alert messages
+#   for_seconds  only alert once the bound has been breached this long
+#   severity     'high' or 'low'; defaults to the direction of the breach
+DEFAULT_RULES = [
+    {'name': 'ph', 'label': 'pH', 'expr': 'ph', 'min': 7.0, 'max': 7.8, 'unit': 'pH'},
+    {'name': 'temperature', 'expr': 'temperature', 'min': 35.0, 'max': 40.0, 'unit': '°C'},
+    {'name': 'turbidity', 'expr': 'turbidity', 'min': 0.0, 'max': 4.0, 'unit': 'NTU'},
+    {'name': 'orp', 'expr': 'orp', 'min': 650.0, 'max': 750.0, 'unit': 'mV'},
+    {'name': 'conductivity', 'expr': 'conductivity', 'min': 200.0, 'max': 1000.0, 'unit': 'ppm'},
+    {'name': 'free_chlorine', 'expr': 'free_chlorine', 'min': 1.0, 'max': 3.0, 'unit': 'ppm'},
+    {'name': 'total_chlorine', 'expr': 'total_chlorine', 'min': 2.0, 'max': 4.0, 'unit': 'ppm'},
+    {'name': 'bromine', 'expr': 'bromine', 'min': 2.0, 'max': 6.0, 'unit': 'ppm'},
+    {'name': 'uv_intensity', 'expr': 'uv_intensity', 'min': 20.0, 'max': 35.0, 'unit': 'mW/cm²'},
+    # Standard threshold for combined chlorine (chloramines)
+    {'name': 'combined_chlorine', 'label': 'Combined Chlorine',
+     'expr': 'total_chlorine - free_chlorine', 'max': 0.5, 'unit': 'ppm'},
+    # ORP drops roughly 59 mV per pH unit; normalised to pH 7.5 it should
+    # stay in range whenever the sanitizer is doing its job
+    {'name': 'orp_ph_consistency', 'label': 'pH-Adjusted ORP',
+     'expr': 'orp + 59 * (ph - 7.5)', 'min': 650.0, 'max': 800.0, 'unit': 'mV'},
+    {'name': 'ph_sustained_high', 'label': 'pH', 'expr': 'ph', 'max': 7.8,
+     'for_seconds': 600, 'unit': 'pH', 'severity': 'high'},
+]
+
+# Functions rule expressions may call; all work on scalars and arrays alike
+FUNCTIONS = {
+    'abs': np.abs,
+    'min': np.minimum,
+    'max': np.maximum,
+    'where': np.where,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.BitAnd, ast.BitOr, ast.Invert,
+)
+
+
+def _parse_expression(expr: str) -> ast.Expression:
+    """Parse a rule expression, allowing only arithmetic over names."""
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid rule expression '{expr}': {e.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in rule expression '{expr}'")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name)
+                                               and node.func.id in FUNCTIONS):
+            raise ValueError(f"Unknown function in rule expression '{expr}'")
+    return tree
+
+
+RULE_KEYS = {'name', 'expr', 'min', 'max', 'label', 'unit', 'for_seconds', 'severity'}
+
+
+def validate_rules(rules: List[Dict]):
+    """Reject rules with missing or unknown keys, so a typo is not silently ignored."""
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise ValueError(f"Alert rules must be objects, got {rule!r}")
+        missing = {'name', 'expr'} - rule.keys()
+        if missing:
+            raise ValueError(f"Rule {rule!r} is missing {', '.join(sorted(missing))}")
+        unknown = rule.keys() - RULE_KEYS
+        if unknown:
+            raise ValueError(f"Unknown key(s) in rule '{rule['name']}': {', '.join(sorted(unknown))}; "
+                             f"expected one of {', '.join(sorted(RULE_KEYS))}")
+
+
+def load_rules(path: str) -> List[Dict]:
+    """Load rules from a JSON file holding a list of rule dicts."""
+    with open(path) as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"{path} must hold a list of alert rules")
+    validate_rules(rules)
+    return rules
+
+
+class RuleEngine:
+    """Alert rules parsed and compiled once into a single evaluator.
+
+    All rule expressions are compiled into one code object that yields every
+    rule's value in a single eval, and the bound and duration checks are then
+    done for all rules at once with NumPy. The same code object runs on a
+    dict of scalars (one sample) or a dict of arrays (a whole series).
+    """
+
+    def __init__(self, rules: List[Dict] = DEFAULT_RULES):
+        validate_rules(rules)
+        self.rules = [dict(rule) for rule in rules]
+        names = set()
+        trees = []
+        for rule in self.rules:
+            if rule['name'] in names:
+                raise ValueError(f"Duplicate rule name '{rule['name']}'")
+            names.add(rule['name'])
+            if 'min' not in rule and 'max' not in rule:
+                raise ValueError(f"Rule '{rule['name']}' needs a min or max")
+            rule.setdefault('label', rule['name'].replace('_', ' ').title())
+            rule.setdefault('unit', '')
+            trees.append(_parse_expression(rule['expr']))
+
+        self.sensors = sorted({
+            node.id for tree in trees for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and node.id not in FUNCTIONS
+        })
+        unknown = [name for name in self.sensors if name not in SENSOR_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown sensor(s) in alert rules: {', '.join(unknown)}; "
+                             f"expected one of {', '.join(SENSOR_TYPES)}")
+        combined = ast.Expression(ast.Tuple([tree.body for tree in trees], ast.Load()))
+        self._code = compile(ast.fix_missing_locations(combined), '<alert rules>', 'eval')
+        self._globals = {'__builtins__': {}, **FUNCTIONS}
+
+        self.names = [rule['name'] for rule in self.rules]
+        self._mins = np.array([rule.get('min', -np.inf) for rule in self.rules], dtype=float)
+        self._maxs = np.array([rule.get('max', np.inf) for rule in self.rules], dtype=float)
+        self._durations = np.array([rule.get('for_seconds', 0.0) for rule in self.rules], dtype=float)
+        self._default_state = self.new_state()
+
+    def new_state(self) -> np.ndarray:
+        """Per-source streaming state: when each rule's current breach began."""
+        return np.full(len(self.rules), np.nan)
+
+    def _values(self, data: Dict):
+        return eval(self._code, self._globals, data)
+
+    def check(self, readings: Dict[str, float], timestamp: Optional[float] = None,
+              state: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Evaluate every rule for one sample.
+
+        Returns (values, low, active) arrays in rule order, where low tells
+        which way an active rule was breached. `state` tracks breach start
+        times for duration rules, one state per tub.
+        """
+        now = time.time() if timestamp is None else timestamp
+        state = self._default_state if state is None else state
+        values = np.array(self._values(readings), dtype=float)
+        low = values < self._mins
+        breached = low | (values > self._maxs)
+
+        state[~breached] = np.nan
+        state[breached & np.isnan(state)] = now
+        active = breached & (now - state >= self._durations)
+        return values, low, active
+
+    def evaluate(self, readings: Dict[str, float], timestamp: Optional[float] = None,
+                 state: Optional[np.ndarray] = None) -> Dict[str, Tuple[bool, str, str]]:
+        """Evaluate one sample into (is_alert, message, severity) per rule."""
+        values, low, active = self.check(readings, timestamp, state)
+        alerts = {}
+        for i, rule in enumerate(self.rules):
+            value = f"{values[i]:.1f} {rule['unit']}".rstrip()
+            if np.isnan(values[i]):
+                # A probe that has not answered yet, or one the rule depends on
+                alerts[rule['name']] = (False, f"{rule['label']} unknown: no reading", 'none')
+            elif active[i]:
+                direction = 'low' if low[i] else 'high'
+                held = f" for {rule['for_seconds'] / 60:.0f} min" if rule.get('for_seconds') else ''
+                alerts[rule['name']] = (True, f"{rule['label']} too {direction}{held}: {value}",
+                                        rule.get('severity', direction))
+            else:
+                alerts[rule['name']] = (False, f"{rule['label']} normal: {value}", 'none')
+        return alerts
+
+    def evaluate_arrays(self, columns: Dict[str, np.ndarray], timestamps,
+                        state: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Evaluate every rule over whole series at once.
+
+        `columns` maps sensor names to equal-length arrays, and `timestamps`
+        are datetime64 values or epoch seconds, oldest first. Returns
+        'values', 'low' and 'active' arrays of shape (rules, samples), with
+        rows in the order of self.names. Passing the same `state` (from
+        new_state()) for consecutive batches carries breaches across them.
+        """
+        seconds = np.asarray(timestamps)
+        if np.issubdtype(seconds.dtype, np.datetime64):
+            seconds = seconds.astype('datetime64[us]').astype('int64') / 1e6
+        seconds = seconds.astype(float)
+        samples = len(seconds)
+
+        values = np.vstack([
+            np.broadcast_to(np.asarray(value, dtype=float), (samples,))
+            for value in self._values(columns)
+        ])
+        low = values < self._mins[:, None]
+        breached = low | (values > self._maxs[:, None])
+
+        # Index of the sample where each breach run began
+        previous = np.zeros_like(breached)
+        previous[:, 1:] = breached[:, :-1]
+        run_start = np.where(breached & ~previous, np.arange(samples), 0)
+        run_start = np.maximum.accumulate(run_start, axis=1)
+        breach_began = seconds[run_start]
+        if state is not None and samples:
+            # A breach open at the end of the previous batch began earlier
+            continued = (run_start == 0) & (breached[:, :1] & ~np.isnan(state)[:, None])
+            breach_began = np.where(continued, state[:, None], breach_began)
+            state[:] = np.where(breached[:, -1], breach_began[:, -1], np.nan)
+        held = seconds - breach_began
+        active = breached & (held >= self._durations[:, None])
+        return {'values': values, 'low': low, 'active': active}
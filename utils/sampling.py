@@ -0,0 +1,123 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-sensor sampling policy:
+#   interval  seconds between samples
+#   epsilon   store a sample only when it moves more than this from the last stored value
+#   max_age   ...or when the last stored value is older than this many seconds
+DEFAULT_POLICIES = {
+    'ph': {'interval': 5, 'epsilon': 0.05, 'max_age': 900},
+    'temperature': {'interval': 30, 'epsilon': 0.2, 'max_age': 900},
+    'turbidity': {'interval': 10, 'epsilon': 0.2, 'max_age': 900},
+    'orp': {'interval': 1, 'epsilon': 5.0, 'max_age': 900},
+    'conductivity': {'interval': 30, 'epsilon': 25.0, 'max_age': 900},
+    'free_chlorine': {'interval': 5, 'epsilon': 0.2, 'max_age': 900},
+    'total_chlorine': {'interval': 5, 'epsilon': 0.2, 'max_age': 900},
+    'bromine': {'interval': 5, 'epsilon': 0.2, 'max_age': 900},
+    'uv_intensity': {'interval': 10, 'epsilon': 1.0, 'max_age': 900},
+}
+
+
+def load_policies(path: str) -> Dict[str, Dict]:
+    """Load sampling policies from JSON, falling back to defaults per sensor."""
+    with open(path) as f:
+        overrides = json.load(f)
+    return {sensor: dict(policy, **overrides.get(sensor, {}))
+            for sensor, policy in DEFAULT_POLICIES.items()}
+
+
+class SamplingScheduler:
+    """Decides which sensors to sample on a tick and which samples to store.
+
+    Sensors are sampled on their own interval. A sample is stored only if it
+    differs from the last stored value by more than the sensor's epsilon, or
+    the last stored value is older than max_age. Stored rows leave unchanged
+    sensors NULL, to be read back as a step-wise series by carrying the last
+    stored value forward.
+    """
+
+    def __init__(self, policies: Dict[str, Dict] = DEFAULT_POLICIES):
+        self.policies = policies
+        self.latest: Dict[str, float] = {}
+        self._last_sampled: Dict[str, float] = {}
+        self._last_stored: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """Sensors whose sampling interval has elapsed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [
+                sensor for sensor, policy in self.policies.items()
+                if now - self._last_sampled.get(sensor, float('-inf')) >= policy['interval']
+            ]
+
+    def record(self, samples: Dict[str, float], now: Optional[float] = None) -> Dict[str, float]:
+        """Take new samples and return the ones that pass the deadband."""
+        now = time.time() if now is None else now
+        to_store = {}
+        with self._lock:
+            for sensor, value in samples.items():
+                if value is None or sensor not in self.policies:
+                    continue
+                self.latest[sensor] = value
+                self._last_sampled[sensor] = now
+
+                policy = self.policies[sensor]
+                stored = self._last_stored.get(sensor)
+                if (stored is None or abs(value - stored[0]) > policy['epsilon']
+                        or now - stored[1] >= policy['max_age']):
+                    self._last_stored[sensor] = (value, now)
+                    to_store[sensor] = value
+        return to_store
+
+
+class SamplingLoop:
+    """Drives a SamplingScheduler on a background thread, apart from page reruns.
+
+    Every `tick` seconds (by default the shortest sampling interval) the
+    due sensors are read with read(sensors), and the samples that pass the
+    deadband are handed to store(values). Pages only read scheduler.latest.
+    """
+
+    def __init__(self, scheduler: SamplingScheduler,
+                 read: Callable[[List[str]], Dict[str, float]],
+                 store: Callable[[Dict[str, float]], None],
+                 tick: Optional[float] = None):
+        self.scheduler = scheduler
+        self.read = read
+        self.store = store
+        self.tick = tick or min(policy['interval'] for policy in scheduler.policies.values())
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling', daemon=True)
+
+    def start(self) -> 'SamplingLoop':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def sample_once(self, now: Optional[float] = None):
+        """Read the sensors that are due and store what passes the deadband."""
+        now = time.time() if now is None else now
+        due = self.scheduler.due(now)
+        if due:
+            to_store = self.scheduler.record(self.read(due), now)
+            if to_store:
+                self.store(to_store)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.time()
+            try:
+                self.sample_once(started)
+            except Exception as e:
+                logger.warning("Sampling failed: %s", e)
+            self._stop.wait(max(0.0, self.tick - (time.time() - started)))
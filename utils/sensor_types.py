@@ -0,0 +1,4 @@
+# The sensors a tub reports, in display order. Kept in a module of its own so
+# that anything, including the rule engine, can import it without cycles.
+SENSOR_TYPES = ['ph', 'temperature', 'turbidity', 'orp', 'conductivity',
+                'free_chlorine', 'total_chlorine', 'bromine', 'uv_intensity']
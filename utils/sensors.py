@@ -1,85 +1,118 @@
+import math
 import random
+import time
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from utils.calibration import CalibrationCurve
+from utils.rules import DEFAULT_RULES, RuleEngine
+from utils.sensor_types import SENSOR_TYPES
+
+# Realistic raw value ranges used by the simulator and simulated probes
+SIMULATED_RANGES = {
+    'ph': (6.8, 7.8),
+    'temperature': (35.0, 40.0),
+    'turbidity': (0.5, 5.0),
+    'orp': (650.0, 750.0),  # ORP in millivolts (mV)
+    'conductivity': (200.0, 1000.0),  # TDS in ppm
+    'free_chlorine': (1.0, 5.0),  # Free chlorine in ppm
+    'total_chlorine': (2.0, 6.0),  # Total chlorine in ppm
+    'bromine': (2.0, 6.0),  # Bromine in ppm
+    'uv_intensity': (15.0, 40.0)  # UV intensity in mW/cm²
+}
+
+class SimulatedWalk:
+    """A simulated value that drifts rather than jumping between samples.
+
+    Water chemistry changes over minutes, so each value relaxes towards the
+    middle of its range with time constant `tau` seconds plus Gaussian
+    noise (an Ornstein-Uhlenbeck process), spreading over about the whole
+    range. Samples a second apart differ a little, samples an hour apart
+    are nearly independent.
+    """
+
+    def __init__(self, low: float, high: float, tau: float = 14400.0):
+        self.low = low
+        self.high = high
+        self.tau = tau
+        self.value = random.uniform(low, high)
+        self._last: Optional[float] = None
+
+    def sample(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        if self._last is not None and now > self._last:
+            mean, spread = (self.low + self.high) / 2, (self.high - self.low) / 6
+            decay = math.exp(-(now - self._last) / self.tau)
+            self.value = (mean + (self.value - mean) * decay
+                          + spread * math.sqrt(1 - decay ** 2) * random.gauss(0.0, 1.0))
+            self.value = min(max(self.value, self.low), self.high)
+        self._last = now
+        return self.value
 
 class SensorSimulator:
-    def __init__(self):
-        self.calibration = {
-            'ph': {'offset': 0.0, 'scale': 1.0},
-            'temperature': {'offset': 0.0, 'scale': 1.0},
-            'turbidity': {'offset': 0.0, 'scale': 1.0},
-            'orp': {'offset': 0.0, 'scale': 1.0},
-            'conductivity': {'offset': 0.0, 'scale': 1.0},
-            'free_chlorine': {'offset': 0.0, 'scale': 1.0},
-            'total_chlorine': {'offset': 0.0, 'scale': 1.0},
-            'bromine': {'offset': 0.0, 'scale': 1.0},
-            'uv_intensity': {'offset': 0.0, 'scale': 1.0}
+    def __init__(self, rules: List[Dict] = DEFAULT_RULES):
+        # Alert rules are compiled once here rather than on every check
+        self.rule_engine = RuleEngine(rules)
+        self.calibration: Dict[str, CalibrationCurve] = {
+            sensor: CalibrationCurve() for sensor in SENSOR_TYPES
         }
+        self.calibration_loaded = False
+        # When a future-dated calibration takes effect and curves must be reloaded
+        self.calibration_expires: Optional[datetime] = None
+        self._walks = {sensor: SimulatedWalk(low, high) for sensor, (low, high) in SIMULATED_RANGES.items()}
+        self._combined_chlorine = SimulatedWalk(0.5, 1.5)
 
-    def get_readings(self) -> Dict[str, float]:
-        # Simulate sensor readings with realistic values
-        raw_readings = {
-            'ph': random.uniform(6.8, 7.8),
-            'temperature': random.uniform(35.0, 40.0),
-            'turbidity': random.uniform(0.5, 5.0),
-            'orp': random.uniform(650.0, 750.0),  # ORP in millivolts (mV)
-            'conductivity': random.uniform(200.0, 1000.0),  # TDS in ppm
-            'free_chlorine': random.uniform(1.0, 5.0),  # Free chlorine in ppm
-            'total_chlorine': random.uniform(2.0, 6.0),  # Total chlorine in ppm
-            'bromine': random.uniform(2.0, 6.0),  # Bromine in ppm
-            'uv_intensity': random.uniform(15.0, 40.0)  # UV intensity in mW/cm²
-        }
+    def get_raw_readings(self, now: Optional[float] = None) -> Dict[str, float]:
+        # Simulate sensor readings with realistic values that drift over time
+        now = time.time() if now is None else now
+        raw_readings = {sensor: walk.sample(now) for sensor, walk in self._walks.items()}
 
         # Ensure total chlorine is always higher than free chlorine
         raw_readings['total_chlorine'] = max(
             raw_readings['total_chlorine'],
-            raw_readings['free_chlorine'] + random.uniform(0.5, 1.5)
+            raw_readings['free_chlorine'] + self._combined_chlorine.sample(now)
         )
 
-        # Apply calibration
-        calibrated_readings = {
-            sensor: (value + self.calibration[sensor]['offset']) * self.calibration[sensor]['scale']
+        return raw_readings
+
+    def get_readings(self) -> Dict[str, float]:
+        return self.calibrate(self.get_raw_readings())
+
+    def calibrate(self, raw_readings: Dict[str, float]) -> Dict[str, float]:
+        return {
+            sensor: float(self.calibration[sensor].apply(value))
             for sensor, value in raw_readings.items()
         }
 
-        return calibrated_readings
+    def load_calibration(self, curves: Dict[str, CalibrationCurve], expires: Optional[datetime] = None):
+        """Replace the in-memory calibration with the curves in effect from storage."""
+        for sensor_type in SENSOR_TYPES:
+            self.set_calibration(sensor_type, curves.get(sensor_type, CalibrationCurve()))
+        self.calibration_loaded = True
+        self.calibration_expires = expires
 
-    def update_calibration(self, sensor_type: str, offset: float, scale: float):
+    def calibration_stale(self, now: Optional[datetime] = None) -> bool:
+        """Whether the calibration must be (re)loaded from storage."""
+        return (not self.calibration_loaded or self.calibration_expires is not None
+                and (now or datetime.now()) >= self.calibration_expires)
+
+    def refresh_calibration(self, db):
+        """Load the calibration in effect from db (a Database) if it is stale.
+
+        Calibration is stored in the database, so this loads it once per
+        process, and again when a future-dated version takes effect.
+        """
+        if self.calibration_stale():
+            history = db.get_calibration_history()
+            self.load_calibration(history.current(), history.next_change())
+
+    def set_calibration(self, sensor_type: str, curve: CalibrationCurve):
         if sensor_type in self.calibration:
-            self.calibration[sensor_type]['offset'] = offset
-            self.calibration[sensor_type]['scale'] = scale
-
-    def check_alerts(self, readings: Dict[str, float]) -> Dict[str, Tuple[bool, str]]:
-        alerts = {}
-        
-        # Define threshold values
-        thresholds = {
-            'ph': {'min': 7.0, 'max': 7.8, 'unit': 'pH'},
-            'temperature': {'min': 35.0, 'max': 40.0, 'unit': '°C'},
-            'turbidity': {'min': 0.0, 'max': 4.0, 'unit': 'NTU'},
-            'orp': {'min': 650.0, 'max': 750.0, 'unit': 'mV'},
-            'conductivity': {'min': 200.0, 'max': 1000.0, 'unit': 'ppm'},
-            'free_chlorine': {'min': 1.0, 'max': 3.0, 'unit': 'ppm'},
-            'total_chlorine': {'min': 2.0, 'max': 4.0, 'unit': 'ppm'},
-            'bromine': {'min': 2.0, 'max': 6.0, 'unit': 'ppm'},
-            'uv_intensity': {'min': 20.0, 'max': 35.0, 'unit': 'mW/cm²'}
-        }
+            self.calibration[sensor_type] = curve
+
+    def update_calibration(self, sensor_type: str, offset: float, scale: float):
+        self.set_calibration(sensor_type, CalibrationCurve.from_offset_scale(offset, scale))
 
-        for sensor, value in readings.items():
-            threshold = thresholds[sensor]
-            if value < threshold['min']:
-                alerts[sensor] = (True, f"{sensor.replace('_', ' ').title()} too low: {value:.1f} {threshold['unit']}")
-            elif value > threshold['max']:
-                alerts[sensor] = (True, f"{sensor.replace('_', ' ').title()} too high: {value:.1f} {threshold['unit']}")
-            else:
-                alerts[sensor] = (False, f"{sensor.replace('_', ' ').title()} normal: {value:.1f} {threshold['unit']}")
-
-        # Add combined chlorine alert
-        if 'total_chlorine' in readings and 'free_chlorine' in readings:
-            combined_chlorine = readings['total_chlorine'] - readings['free_chlorine']
-            if combined_chlorine > 0.5:  # Standard threshold for combined chlorine
-                alerts['combined_chlorine'] = (True, f"Combined Chlorine high: {combined_chlorine:.1f} ppm")
-            else:
-                alerts['combined_chlorine'] = (False, f"Combined Chlorine normal: {combined_chlorine:.1f} ppm")
-
-        return alerts
+    def check_alerts(self, readings: Dict[str, float],
+                     timestamp: Optional[float] = None) -> Dict[str, Tuple[bool, str, str]]:
+        return self.rule_engine.evaluate(readings, timestamp)
@@ -0,0 +1,54 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+_timings: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def record(name: str, started: float):
+    """Record the milliseconds elapsed since a perf_counter() start value.
+
+    Only the first measurement of each name is kept, since Streamlit re-runs
+    the script on every refresh and the cold-start value is the one of interest.
+    """
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _lock:
+        if name in _timings:
+            return
+        _timings[name] = elapsed_ms
+    logger.info("startup: %s took %.1f ms", name, elapsed_ms)
+
+
+@contextmanager
+def measure(name: str):
+    """Time the enclosed block and record it under the given name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, started)
+
+
+def lazy_import(module_name: str):
+    """Import a module on first use, timing the import the first time only.
+
+    Always goes through importlib, whose import lock makes a second thread
+    wait for a module another thread is still initialising.
+    """
+    if module_name in sys.modules:
+        return importlib.import_module(module_name)
+    with measure(f"import {module_name}"):
+        return importlib.import_module(module_name)
+
+
+def get_timings() -> Dict[str, float]:
+    """Get a snapshot of the recorded startup timings in milliseconds."""
+    with _lock:
+        return dict(_timings)